@@ -23,6 +23,7 @@ import os
 import re
 import shlex
 import shutil
+import sys
 import time
 import uuid
 from dataclasses import dataclass, field
@@ -32,8 +33,12 @@ from fastapi import Request
 from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from .detector import DetectionResult, scan as detector_scan
-from .logger import get_logger, log_request
-from .utils import detection_log_kwargs as _detection_log_kwargs, source_ip as _source_ip
+from .logger import get_logger, log_request, reset_request_context, set_request_context
+from .utils import (
+    detection_log_kwargs as _detection_log_kwargs,
+    json_first_byte,
+    read_body,
+)
 
 if TYPE_CHECKING:
     from .config import DestinationConfig
@@ -47,6 +52,11 @@ _SHUTDOWN_GRACE = 5.0
 _MAX_CONNECTIONS_PER_DEST = int(os.environ.get("MAX_STDIO_CONNECTIONS", "10"))
 _MAX_QUEUE_SIZE = 256
 
+# StreamReader buffer limit for subprocess stdout.  asyncio's 64 KiB default
+# makes readline() raise on any longer JSON-RPC message (large tool results),
+# and pauses the pipe every 128 KiB while big responses are read.
+_STDOUT_LIMIT = 8 * 1024 * 1024  # 8 MB
+
 STDIO_RESPONSE_TIMEOUT_SECS = float(os.environ.get("STDIO_RESPONSE_TIMEOUT_SECS", "30"))
 
 # Allowlisted parent-process env keys passed to subprocesses.
@@ -72,7 +82,11 @@ _SENTINEL = object()
 #  Per-destination bridge                                                      #
 # --------------------------------------------------------------------------- #
 
-@dataclass
+# slots=True needs Python 3.10+; on 3.9 the bridge keeps an instance __dict__.
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class StdioDestinationBridge:
     """Holds all state for one stdio destination's subprocess and sessions."""
     destination: str
@@ -168,6 +182,7 @@ async def _spawn_process(
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
         env=env,
+        limit=_STDOUT_LIMIT,
     )
 
 
@@ -221,7 +236,24 @@ async def _stdio_stdout_reader(
       - no id (or unknown id) → broadcast to notification queues
     On stdout EOF, pending futures are failed and a restart is attempted.
     After all retries exhausted, all GET streams receive a close sentinel.
+    The task outlives the request that spawned it, so it binds the fixed
+    stdio audit identity for its own log lines.
     """
+    token = set_request_context(
+        user="stdio", source_ip="localhost", destination=bridge.destination
+    )
+    try:
+        await _dispatch_stdout(bridge, dest_config, subprocess_env)
+    finally:
+        reset_request_context(token)
+
+
+async def _dispatch_stdout(
+    bridge: StdioDestinationBridge,
+    dest_config: "DestinationConfig",
+    subprocess_env: dict[str, str],
+) -> None:
+    """Body of :func:`_stdio_stdout_reader`, run inside its request context."""
     logger = get_logger()
 
     for attempt in range(len(_RETRY_DELAYS) + 1):
@@ -260,9 +292,6 @@ async def _stdio_stdout_reader(
 
                 def _log_stdio(*, rpc_id=None, response_body=None):
                     log_request(
-                        user="stdio",
-                        source_ip="localhost",
-                        destination=bridge.destination,
                         mcp_method=None,
                         status_code=200,
                         latency_ms=0.0,
@@ -496,24 +525,16 @@ async def handle_stdio_streamable_http_post(
     the header and are routed to the shared subprocess for that destination.
     """
     start = time.monotonic()
-    source_ip = _source_ip(request)
 
     bridge = await _get_or_create_bridge(destination)
 
-    try:
-        await _ensure_subprocess(bridge, dest_config, subprocess_env)
-    except Exception as exc:
-        get_logger().warning(
-            "subprocess start failed",
-            extra={"destination": destination, "error": str(exc)},
-        )
-        return JSONResponse(
-            status_code=503,
-            content={"error": "Failed to start subprocess"},
-        )
-
-    # Read and parse body
-    body = await request.body()
+    # Read and parse body.  Anything not starting with an object or array
+    # can't be JSON-RPC, so reject it without running the parser.
+    body = await read_body(request)
+    if body is None:
+        return JSONResponse(status_code=413, content={"error": "Request body too large"})
+    if json_first_byte(body) not in (b"{", b"["):
+        return JSONResponse(status_code=400, content={"error": "Invalid JSON body"})
     try:
         payload = json.loads(body)
     except json.JSONDecodeError:
@@ -527,7 +548,6 @@ async def handle_stdio_streamable_http_post(
 
     original_id = payload.get("id")
     mcp_method = payload.get("method")
-    request_body_str = body.decode(errors="replace")
 
     # Validate Mcp-Session-Id header
     session_id_header = request.headers.get("mcp-session-id")
@@ -568,6 +588,22 @@ async def handle_stdio_streamable_http_post(
     else:
         session_id = session_id_header
 
+    # Spawn only once the request is known to be forwardable, so malformed
+    # bodies and bad session headers never launch a subprocess.
+    try:
+        await _ensure_subprocess(bridge, dest_config, subprocess_env)
+    except Exception as exc:
+        if new_session:
+            bridge.sessions.discard(session_id)
+        get_logger().warning(
+            "subprocess start failed",
+            extra={"destination": destination, "error": str(exc)},
+        )
+        return JSONResponse(
+            status_code=503,
+            content={"error": "Failed to start subprocess"},
+        )
+
     # Client notification (no id field) — fire-and-forget, return 202
     if original_id is None:
         data = json.dumps(payload).encode() + b"\n"
@@ -578,13 +614,10 @@ async def handle_stdio_streamable_http_post(
         except OSError:
             pass
         log_request(
-            user="stdio",
-            source_ip=source_ip,
-            destination=destination,
             mcp_method=mcp_method,
             status_code=202,
             latency_ms=(time.monotonic() - start) * 1000,
-            request_body=request_body_str,
+            request_body=body,
         )
         return Response(status_code=202)
 
@@ -610,14 +643,11 @@ async def handle_stdio_streamable_http_post(
         if new_session:
             bridge.sessions.discard(session_id)
         log_request(
-            user="stdio",
-            source_ip=source_ip,
-            destination=destination,
             mcp_method=mcp_method,
             status_code=503,
             latency_ms=(time.monotonic() - start) * 1000,
             error=str(exc),
-            request_body=request_body_str,
+            request_body=body,
         )
         return JSONResponse(
             status_code=503,
@@ -632,14 +662,11 @@ async def handle_stdio_streamable_http_post(
         if new_session:
             bridge.sessions.discard(session_id)
         log_request(
-            user="stdio",
-            source_ip=source_ip,
-            destination=destination,
             mcp_method=mcp_method,
             status_code=504,
             latency_ms=(time.monotonic() - start) * 1000,
             rpc_id=original_id,
-            request_body=request_body_str,
+            request_body=body,
         )
         return JSONResponse(
             status_code=504,
@@ -649,14 +676,11 @@ async def handle_stdio_streamable_http_post(
         if new_session:
             bridge.sessions.discard(session_id)
         log_request(
-            user="stdio",
-            source_ip=source_ip,
-            destination=destination,
             mcp_method=mcp_method,
             status_code=503,
             latency_ms=(time.monotonic() - start) * 1000,
             rpc_id=original_id,
-            request_body=request_body_str,
+            request_body=body,
             error=str(exc),
         )
         return JSONResponse(
@@ -670,14 +694,11 @@ async def handle_stdio_streamable_http_post(
         response_headers["mcp-session-id"] = session_id
 
     log_request(
-        user="stdio",
-        source_ip=source_ip,
-        destination=destination,
         mcp_method=mcp_method,
         status_code=200,
         latency_ms=(time.monotonic() - start) * 1000,
         rpc_id=original_id,
-        request_body=request_body_str,
+        request_body=body,
         response_body=response_body_str,
     )
     return Response(
@@ -748,9 +769,6 @@ async def handle_stdio_streamable_http_get(
             if session_id in bridge.session_stream_uuids:
                 bridge.session_stream_uuids[session_id].discard(stream_uuid)
             log_request(
-                user="stdio",
-                source_ip=_source_ip(request),
-                destination=destination,
                 mcp_method=None,
                 status_code=status_code,
                 latency_ms=(time.monotonic() - start) * 1000,
@@ -814,9 +832,6 @@ async def handle_stdio_streamable_http_delete(
                 pass  # Should not happen after drain
 
     log_request(
-        user="stdio",
-        source_ip=_source_ip(request),
-        destination=destination,
         mcp_method=None,
         status_code=204,
         latency_ms=(time.monotonic() - start) * 1000,
@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import os
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 from urllib.parse import urlparse
 
 import yaml
@@ -56,10 +57,24 @@ def load_config(path: Optional[Path] = None) -> None:
         except yaml.YAMLError as exc:
             raise ValueError(f"Failed to parse {config_path}: {exc}") from exc
 
+    _destinations = _parse_destinations(raw, config_path)
+
+
+def load_config_dict(raw: Optional[dict], source: str = "<dict>") -> None:
+    """Validate an already-parsed config mapping exactly as load_config would.
+
+    *source* stands in for the file path in error messages.
+    """
+    global _destinations
+
+    _destinations = _parse_destinations(raw, source)
+
+
+def _parse_destinations(raw: object, config_path: Union[Path, str]) -> dict[str, DestinationConfig]:
+    """Validate the top-level config mapping and build its DestinationConfigs."""
     if raw is None:
         # Empty file is valid — no destinations configured yet
-        _destinations = {}
-        return
+        return {}
 
     if not isinstance(raw, dict):
         raise ValueError(f"{config_path} must be a YAML mapping at the top level.")
@@ -72,7 +87,7 @@ def load_config(path: Optional[Path] = None) -> None:
             f"{config_path}: 'destinations' must be a mapping of name → {{url: ...}}."
         )
 
-    def _parse_detection_fields(entry: dict, name: str, config_path: Path) -> dict:
+    def _parse_detection_fields(entry: dict, name: str, config_path: Union[Path, str]) -> dict:
         """Extract and validate detection config fields from a destination entry."""
         fields: dict = {}
         for mode_key in ("regex_mode", "ai_mode"):
@@ -84,7 +99,9 @@ def load_config(path: Optional[Path] = None) -> None:
                         f"{config_path}: destination '{name}' has invalid {mode_key} "
                         f"'{val}'. Accepted values: {', '.join(_VALID_DETECTION_MODES)}."
                     )
-                fields[mode_key] = val
+                # Interned so scan()'s comparisons against the mode literals
+                # succeed on identity.
+                fields[mode_key] = sys.intern(val)
         ai_threshold = entry.get("ai_threshold")
         if ai_threshold is not None:
             try:
@@ -204,7 +221,7 @@ def load_config(path: Optional[Path] = None) -> None:
                 f"{config_path}: destination '{name}' must be a string URL or a mapping."
             )
 
-    _destinations = parsed
+    return parsed
 
 
 def get_destination(name: str) -> Optional[DestinationConfig]:
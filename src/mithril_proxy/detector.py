@@ -15,18 +15,42 @@ Each destination independently configures both engines using four modes:
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
 import os
 import re
+import string
+import sys
 import threading
+import warnings
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence
 
 if TYPE_CHECKING:
     from .config import DestinationConfig
 
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - 3.9/3.10
+    import sre_parse as _sre_parse
+
+try:
+    import re2 as _re2  # google-re2: linear-time matching, immune to ReDoS
+except ImportError:  # pragma: no cover - optional dependency
+    _re2 = None
+
+try:
+    import hyperscan as _hyperscan  # SIMD multi-pattern matching
+except ImportError:  # pragma: no cover - optional dependency
+    _hyperscan = None
+
+try:
+    import ahocorasick as _ahocorasick  # pyahocorasick: literal prefilter
+except ImportError:  # pragma: no cover - optional dependency
+    _ahocorasick = None
+
 _log = logging.getLogger("mithril_proxy")
 
 # --------------------------------------------------------------------------- #
@@ -37,28 +61,203 @@ _REDACTION_PLACEHOLDER = "**REDACTED**"
 
 _DEFAULT_PATTERNS_DIR = Path("/etc/mithril-proxy/patterns.d/")
 _PATTERNS_DIR_ENV = "PATTERNS_DIR"
+_REGEX_ENGINE_ENV = "REGEX_ENGINE"
 
 AI_INJECTION_THRESHOLD = float(
     os.environ.get("AI_INJECTION_THRESHOLD", "0.85")
 )
 
 # Mode severity ordering for "strictest wins" logic.
-_MODE_SEVERITY = {"off": 0, "monitor": 1, "redact": 2, "block": 3}
+_MODE_SEVERITY = {"off": 0, "pass": 0, "monitor": 1, "redact": 2, "block": 3}
 
 
 # --------------------------------------------------------------------------- #
 #  Pattern loader + hot-reload                                                 #
 # --------------------------------------------------------------------------- #
 
-_patterns: list[re.Pattern[str]] = []
+# A compiled rule: re.Pattern, or re2's regexp object when REGEX_ENGINE=re2.
+# Both expose the .pattern / .search / .sub that scan() relies on.
+_Regex = Any
+
+_patterns: tuple[_Regex, ...] = ()
+# All of _patterns joined into one alternation, used as a single-pass
+# prefilter in scan(); None when they cannot be combined safely.  With a
+# per-rule prefilter loaded it only screens non-ASCII bodies.
+_combined: Optional[_Regex] = None
+# The per-rule prefilter when REGEX_ENGINE=hyperscan.
+_hs_prefilter: Optional[_HyperscanPrefilter] = None
 _patterns_lock = threading.Lock()
 
+# Numbered/named backreferences change meaning once groups are renumbered
+# inside a combined alternation.
+_BACKREF_RE = re.compile(r"\\(?:[1-9]|g<)|\(\?P=")
+
+# Python reads "{,n}" as "{0,n}"; PCRE (and so Hyperscan) as literal text.
+_HS_UNSAFE_RE = re.compile(r"\{,\d*\}")
+
+
+class _HyperscanPrefilter:
+    """One Hyperscan block-mode database over every rule it accepts.
+
+    Compiled in prefilter mode, so a rule may report a hit its Python pattern
+    then rejects.  The reverse holds only for ASCII text: Hyperscan's caseless
+    Unicode matching is not Python's (it never pairs U+0130 ``İ`` with ``i``),
+    so only ASCII bodies are passed in and rules with non-ASCII sources are
+    listed in *always*, with those Hyperscan cannot take, and searched on
+    every body.
+    """
+
+    __slots__ = ("_db", "_always")
+
+    def __init__(self, db: Any, always: frozenset[int]) -> None:
+        self._db = db
+        self._always = always
+
+    def candidates(self, body: str | bytes, patterns: tuple[_Regex, ...]) -> Sequence[_Regex]:
+        """Return the rules in *patterns* that may match ASCII *body*, in load order.
+
+        *body* may also be ASCII bytes, which are scanned as-is.
+        """
+        hits = set(self._always)
+
+        def on_match(rule_id: int, start: int, end: int, flags: int, context: Any) -> None:
+            hits.add(rule_id)
+
+        data = body.encode("utf-8", "replace") if isinstance(body, str) else body
+        self._db.scan(data, match_event_handler=on_match)
+        if not hits:
+            return []
+        return [p for i, p in enumerate(patterns) if i in hits]
+
+
+class _LiteralPrefilter:
+    """Aho-Corasick automaton over one literal every match of each rule contains.
+
+    Only ASCII bodies are filtered: the body is lowercased and each literal
+    folded to the ASCII character ``re.IGNORECASE`` pairs it with (see
+    :func:`_ascii_folded_literal`), so a rule whose literal is absent cannot
+    match.  Unicode case folding is no such superset (``"İ".casefold()``
+    inserts U+0307), so scan() searches non-ASCII bodies without it.
+    """
+
+    __slots__ = ("_automaton",)
+
+    def __init__(self, automaton: Any) -> None:
+        self._automaton = automaton
+
+    def candidates(self, body: str, patterns: tuple[_Regex, ...]) -> Sequence[_Regex]:
+        """Return the rules in *patterns* whose literal occurs in ASCII *body*, in load order."""
+        hits: set[int] = set()
+        for _, rule_ids in self._automaton.iter(body.lower()):
+            hits.update(rule_ids)
+        if not hits:
+            return []
+        return [p for i, p in enumerate(patterns) if i in hits]
+
 
 def _resolve_patterns_dir() -> Path:
     env_val = os.environ.get(_PATTERNS_DIR_ENV)
     return Path(env_val) if env_val else _DEFAULT_PATTERNS_DIR
 
 
+def _regex_engine() -> str:
+    """Return the ``REGEX_ENGINE`` in effect: ``re`` (default), ``re2`` or ``hyperscan``.
+
+    The alternatives are opt-in rather than picked up when installed: their
+    syntax and Unicode handling differ from Python's in corner cases (RE2's
+    ``\\d``/``\\s``/``\\w`` are ASCII-only, for one).  An unknown or uninstalled
+    engine logs a WARNING and falls back to ``re``.
+    """
+    engine = os.environ.get(_REGEX_ENGINE_ENV, "re").strip().lower() or "re"
+    modules = {"re": re, "re2": _re2, "hyperscan": _hyperscan}
+    if engine not in modules:
+        _log.warning("Unknown %s=%r — using Python re", _REGEX_ENGINE_ENV, engine)
+        return "re"
+    if modules[engine] is None:
+        _log.warning("%s=%s but it is not installed — using Python re", _REGEX_ENGINE_ENV, engine)
+        return "re"
+    return engine
+
+
+@functools.lru_cache(maxsize=1)
+def _re2_options() -> Any:
+    """Return RE2 compile options matching Python's ``re.IGNORECASE``."""
+    options = _re2.Options()
+    options.case_sensitive = False
+    options.log_errors = False
+    return options
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_rule(source: str, use_re2: bool) -> _Regex:
+    """Compile one rule with RE2 when enabled, else (or if RE2 rejects it) Python re.
+
+    RE2 has no backreferences or lookaround, so such rules keep the
+    backtracking engine.  Raises ``re.error`` for patterns neither accepts.
+    Cached per source string, so a reload only compiles new or edited rules;
+    see :func:`clear_pattern_cache`.
+    """
+    if use_re2:
+        try:
+            return _re2.compile(source, _re2_options())
+        except _re2.error:
+            _log.info("Regex pattern %r not supported by RE2 — using Python re", source)
+    return re.compile(source, re.IGNORECASE)
+
+
+def _build_hyperscan_prefilter(patterns: tuple[_Regex, ...]) -> Optional[_HyperscanPrefilter]:
+    """Compile *patterns* into a :class:`_HyperscanPrefilter`, or return None.
+
+    Each rule is tried on its own first so one Hyperscan rejects (e.g. one
+    that matches the empty string) only joins the always-searched list, as
+    does any rule with non-ASCII text.
+    """
+    flags = (
+        _hyperscan.HS_FLAG_CASELESS | _hyperscan.HS_FLAG_SINGLEMATCH
+        | _hyperscan.HS_FLAG_UTF8 | _hyperscan.HS_FLAG_UCP
+        | _hyperscan.HS_FLAG_PREFILTER
+    )
+    ids: list[int] = []
+    always: set[int] = set()
+    for i, p in enumerate(patterns):
+        if not p.pattern.isascii() or _HS_UNSAFE_RE.search(p.pattern):
+            always.add(i)
+            continue
+        try:
+            _hyperscan.Database().compile(expressions=[p.pattern.encode()], flags=flags)
+        except _hyperscan.error as exc:
+            _log.info("Regex pattern %r not supported by Hyperscan (%s) — searched on every body", p.pattern, exc)
+            always.add(i)
+            continue
+        ids.append(i)
+    if not ids:
+        return None
+
+    db = _hyperscan.Database(mode=_hyperscan.HS_MODE_BLOCK)
+    try:
+        db.compile(
+            expressions=[patterns[i].pattern.encode() for i in ids],
+            ids=ids,
+            flags=[flags] * len(ids),
+        )
+    except _hyperscan.error as exc:
+        _log.warning("Hyperscan database build failed, using Python re: %s", exc)
+        return None
+    return _HyperscanPrefilter(db, frozenset(always))
+
+
+# Threads reading pattern files; each read releases the GIL while it waits.
+_PATTERN_READ_WORKERS = 8
+
+
+def _read_pattern_file(path: str) -> bytes | OSError:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as exc:
+        return exc
+
+
 def load_patterns(patterns_dir: Optional[Path] = None) -> int:
     """Load regex patterns from flat files in *patterns_dir*.
 
@@ -74,44 +273,355 @@ def load_patterns(patterns_dir: Optional[Path] = None) -> int:
     if not target.is_dir():
         _log.warning("Patterns directory does not exist: %s — regex engine has 0 patterns", target)
         with _patterns_lock:
-            global _patterns
-            _patterns = []
+            global _patterns, _combined, _hs_prefilter, _candidates
+            _patterns = ()
+            _combined = None
+            _hs_prefilter = None
+            _candidates = _specialize((), None, None)
         return 0
 
-    compiled: list[re.Pattern[str]] = []
-    for filepath in sorted(target.iterdir()):
-        if filepath.suffix not in (".txt", ".conf"):
-            continue
-        try:
-            lines = filepath.read_text(encoding="utf-8").splitlines()
-        except OSError as exc:
-            _log.warning("Cannot read pattern file %s: %s", filepath, exc)
+    engine = _regex_engine()
+    use_re2 = engine == "re2"
+    compiled: list[_Regex] = []
+    with os.scandir(target) as it:
+        entries = sorted(
+            (e for e in it if os.path.splitext(e.name)[1] in (".txt", ".conf")),
+            key=lambda e: e.name,
+        )
+    paths = [e.path for e in entries]
+    if len(paths) > 1:
+        # Overlap the per-file open/read latency; parsing and compiling stay
+        # on this thread, in file order.
+        with ThreadPoolExecutor(
+            max_workers=min(_PATTERN_READ_WORKERS, len(paths)),
+            thread_name_prefix="mithril-patterns",
+        ) as pool:
+            contents = list(pool.map(_read_pattern_file, paths))
+    else:
+        contents = [_read_pattern_file(p) for p in paths]
+
+    for entry, data in zip(entries, contents):
+        if isinstance(data, OSError):
+            _log.warning("Cannot read pattern file %s: %s", entry.path, data)
             continue
 
-        for lineno, line in enumerate(lines, start=1):
-            stripped = line.strip()
-            if not stripped or stripped.startswith("#"):
+        # Split and filter as bytes; only rule lines are decoded.
+        for lineno, raw in enumerate(data.splitlines(), start=1):
+            raw = raw.strip()
+            if not raw or raw.startswith(b"#"):
                 continue
             try:
-                compiled.append(re.compile(stripped, re.IGNORECASE))
+                stripped = raw.decode("utf-8").strip()
+            except UnicodeDecodeError as exc:
+                _log.warning("Invalid UTF-8 in %s line %d: %s", entry.name, lineno, exc)
+                continue
+            if not stripped or stripped.startswith("#"):
+                continue  # blank or comment once Unicode whitespace is stripped
+            try:
+                compiled.append(_compile_rule(stripped, use_re2))
             except re.error as exc:
                 _log.warning(
                     "Invalid regex in %s line %d: %r — %s",
-                    filepath.name, lineno, stripped, exc,
+                    entry.name, lineno, stripped, exc,
                 )
 
+    rules = tuple(compiled)
+    hs_prefilter = _build_hyperscan_prefilter(rules) if engine == "hyperscan" else None
+    rule_prefilter = hs_prefilter or _build_literal_prefilter(rules)
+    combined = _combine_patterns(rules, use_re2)
     with _patterns_lock:
-        _patterns = compiled
-
-    _log.info("Loaded %d regex patterns from %s", len(compiled), target)
+        _patterns = rules
+        _combined = combined
+        _hs_prefilter = hs_prefilter
+        _candidates = _specialize(rules, combined, rule_prefilter)
+
+    if use_re2:
+        n_re2 = sum(1 for p in compiled if not isinstance(p, re.Pattern))
+        _log.info(
+            "Loaded %d regex patterns from %s (%d RE2, %d Python re)",
+            len(compiled), target, n_re2, len(compiled) - n_re2,
+        )
+    else:
+        _log.info("Loaded %d regex patterns from %s", len(compiled), target)
     return len(compiled)
 
 
+def _combine_patterns(patterns: tuple[_Regex, ...], use_re2: bool = False) -> Optional[_Regex]:
+    """Join *patterns* into one case-insensitive alternation, or return None.
+
+    Patterns with backreferences, or that only compile on their own (e.g. a
+    global inline flag), leave the prefilter off and scan() checks each one.
+    When every rule compiled under RE2 the alternation is built with RE2 too,
+    which scopes inline flags to their group.
+    """
+    if not patterns:
+        return None
+    if use_re2 and not any(isinstance(p, re.Pattern) for p in patterns):
+        try:
+            return _re2.compile(
+                "|".join(f"(?:{p.pattern})" for p in patterns), _re2_options()
+            )
+        except _re2.error as exc:
+            _log.info("Regex patterns not combined, scanning individually: %s", exc)
+            return None
+    if any(_BACKREF_RE.search(p.pattern) for p in patterns):
+        return None
+    try:
+        # 3.9-3.10 only warn about a mid-pattern global flag, then apply it to
+        # every alternative; treat that as a failure too.
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            return re.compile(
+                "|".join(f"(?:{p.pattern})" for p in patterns), re.IGNORECASE
+            )
+    except (re.error, DeprecationWarning) as exc:
+        _log.info("Regex patterns not combined, scanning individually: %s", exc)
+        return None
+
+
+_REPEAT_OPS = tuple(
+    op for op in (
+        _sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT,
+        getattr(_sre_parse, "POSSESSIVE_REPEAT", None),  # 3.11+
+    ) if op is not None
+)
+
+
+def _required_literal(source: str) -> str:
+    """Return the longest literal run every match of *source* must contain, or ``""``.
+
+    Only mandatory structure is walked: top-level items, groups, and repeats
+    with a minimum of at least one.  Alternations, classes and lookarounds
+    end the current run.
+    """
+    try:
+        parsed = _sre_parse.parse(source, re.IGNORECASE)
+    except Exception:  # noqa: BLE001 - re2-only syntax, parser limits
+        return ""
+    best = ""
+
+    def walk(items: Any) -> None:
+        nonlocal best
+        run: list[str] = []
+        for op, av in items:
+            if op is _sre_parse.LITERAL:
+                run.append(chr(av))
+                continue
+            if len(run) > len(best):
+                best = "".join(run)
+            run = []
+            if op is _sre_parse.SUBPATTERN:
+                walk(av[-1])
+            elif op in _REPEAT_OPS and av[0] >= 1:
+                walk(av[2])
+            elif op is getattr(_sre_parse, "ATOMIC_GROUP", None):
+                walk(av)
+        if len(run) > len(best):
+            best = "".join(run)
+
+    walk(parsed)
+    return best
+
+
+def _build_literal_prefilter(patterns: tuple[_Regex, ...]) -> Optional[_LiteralPrefilter]:
+    """Build a :class:`_LiteralPrefilter` when pyahocorasick is installed.
+
+    Returns None when any rule has no required literal; such a rule would
+    have to be searched on every body, and the combined alternation already
+    covers that case in one pass.
+    """
+    if _ahocorasick is None or not patterns:
+        return None
+    by_literal: dict[str, list[int]] = {}
+    for i, p in enumerate(patterns):
+        literal = _ascii_folded_literal(_required_literal(p.pattern))
+        if not literal:
+            return None
+        by_literal.setdefault(literal, []).append(i)
+    automaton = _ahocorasick.Automaton()
+    for literal, rule_ids in by_literal.items():
+        automaton.add_word(literal, tuple(rule_ids))
+    automaton.make_automaton()
+    return _LiteralPrefilter(automaton)
+
+
+def _ascii_folded_literal(literal: str) -> str:
+    """Map *literal* to the text its ``re.IGNORECASE`` match has in a lowercased ASCII body.
+
+    ASCII characters are lowercased; a non-ASCII one becomes the ASCII letter
+    IGNORECASE pairs it with (U+017F ``ſ`` and ``s``, U+0130 ``İ`` and ``i``)
+    or, lacking one, stays as is and so never occurs in an ASCII body.
+    """
+    folded = []
+    for ch in literal:
+        if not ch.isascii():
+            pattern = re.compile(re.escape(ch), re.IGNORECASE)
+            ch = next((a for a in string.ascii_lowercase if pattern.fullmatch(a)), ch)
+        folded.append(ch.lower())
+    return "".join(folded)
+
+
+class _NotFoldable(Exception):
+    pass
+
+
+def _folded_tree(items: Any, fold: bool) -> tuple:
+    """Return a parse tree as nested tuples, ASCII-lowercasing literals when *fold*.
+
+    Raises :class:`_NotFoldable` for constructs lowercasing cannot express:
+    a non-ASCII literal or range endpoint (IGNORECASE may fold ``\\u017f``
+    or ``\\u212a`` onto ASCII), a class range spanning letters and
+    non-letters, or a case-sensitive ``(?-i:...)`` group.
+    """
+    return tuple((op, _folded_arg(op, av, fold)) for op, av in items)
+
+
+def _folded_arg(op: Any, av: Any, fold: bool) -> Any:
+    """Fold one ``(op, av)`` item's argument, walking the subpatterns *op* holds."""
+    if op is _sre_parse.LITERAL or op is _sre_parse.NOT_LITERAL:
+        if av > 127:
+            raise _NotFoldable
+        return av + 32 if fold and 65 <= av <= 90 else av
+    if op is _sre_parse.RANGE:
+        lo, hi = av
+        if hi > 127:
+            raise _NotFoldable
+        if not fold:
+            return av
+        if 65 <= lo and hi <= 90:
+            return (lo + 32, hi + 32)
+        if not (97 <= lo and hi <= 122) and lo <= 122 and hi >= 65:
+            raise _NotFoldable
+        return av
+    if op is _sre_parse.IN:
+        return _folded_tree(av, fold)
+    if op is _sre_parse.SUBPATTERN:
+        group, add_flags, del_flags, sub = av
+        if del_flags & re.IGNORECASE:
+            raise _NotFoldable
+        return (group, add_flags, del_flags, _folded_tree(sub, fold))
+    if op in _REPEAT_OPS:
+        lo, hi, sub = av
+        return (lo, hi, _folded_tree(sub, fold))
+    if op is _sre_parse.BRANCH:
+        _, branches = av
+        return tuple(_folded_tree(b, fold) for b in branches)
+    if op is _sre_parse.ASSERT or op is _sre_parse.ASSERT_NOT:
+        direction, sub = av
+        return (direction, _folded_tree(sub, fold))
+    if op is _sre_parse.GROUPREF_EXISTS:
+        group, yes, no = av
+        return (group, _folded_tree(yes, fold), _folded_tree(no, fold) if no else None)
+    if op is getattr(_sre_parse, "ATOMIC_GROUP", None):
+        return _folded_tree(av, fold)
+    return av  # AT, ANY, CATEGORY, GROUPREF: no literals inside
+
+
+@functools.lru_cache(maxsize=4096)
+def _ascii_lowered_rule(source: str) -> Optional[re.Pattern[str]]:
+    """Compile *source* case-sensitively for searching an ASCII body's ``lower()``.
+
+    For ASCII text ``b``, the result finds the same spans in ``b.lower()`` as
+    the ``re.IGNORECASE`` rule finds in ``b`` (lowercasing ASCII keeps every
+    offset), without sre's per-character case folding.  Returns None unless
+    *source* is ASCII and lowercasing it changes nothing but letter case in
+    the parse tree: ``\\S``, ``\\x41`` or ``[A-z]`` all fail that check.
+    """
+    if not source.isascii():
+        return None
+    lowered = source.lower()
+    try:
+        expected = _folded_tree(_sre_parse.parse(source, re.IGNORECASE).data, True)
+        if _folded_tree(_sre_parse.parse(lowered).data, False) != expected:
+            return None
+        return re.compile(lowered)
+    except Exception:  # noqa: BLE001 - _NotFoldable, re.error, parser limits
+        return None
+
+
+def _min_match_len(patterns: tuple[_Regex, ...]) -> int:
+    """Return a lower bound on the length of any match of any rule in *patterns*.
+
+    Widths come from Python's regex parser, which also reads RE2 sources
+    close enough for a lower bound; a rule it cannot parse counts as 0.
+    """
+    lengths = []
+    for p in patterns:
+        try:
+            lengths.append(_sre_parse.parse(p.pattern, re.IGNORECASE).getwidth()[0])
+        except Exception:  # noqa: BLE001 - re2-only syntax, parser limits
+            return 0
+    return min(lengths, default=0)
+
+
+def _specialize(
+    patterns: tuple[_Regex, ...],
+    combined: Optional[_Regex],
+    rule_prefilter: Optional[_HyperscanPrefilter | _LiteralPrefilter],
+) -> Callable[[str], Sequence[_Regex]]:
+    """Build scan()'s candidate-rule function for one loaded rule set.
+
+    The rule list and the active prefilter's bound method are baked into the
+    closure, so scan() reads a single global (no lock: rebinding is atomic)
+    and never re-checks which prefilter is in use.  Bodies shorter than the
+    shortest possible match get no candidates without running a regex.
+
+    A *rule_prefilter* only sees ASCII bodies; others take the combined
+    alternation (or every rule) as if it were absent.
+    """
+    if combined is not None:
+        combined_search = combined.search
+        lowered = (
+            _ascii_lowered_rule(combined.pattern)
+            if isinstance(combined, re.Pattern) and rule_prefilter is None else None
+        )
+        if lowered is not None:
+            lowered_search = lowered.search
+
+            def prefilter(body: str) -> Sequence[_Regex]:
+                if body.isascii():
+                    return patterns if lowered_search(body.lower()) else []
+                return patterns if combined_search(body) else []
+        else:
+            def prefilter(body: str) -> Sequence[_Regex]:
+                return patterns if combined_search(body) else []
+    else:
+        def prefilter(body: str) -> Sequence[_Regex]:
+            return patterns
+
+    if rule_prefilter is not None:
+        rule_candidates = rule_prefilter.candidates
+        unfiltered = prefilter
+
+        def prefilter(body: str) -> Sequence[_Regex]:
+            if body.isascii():
+                return rule_candidates(body, patterns)
+            return unfiltered(body)
+
+    min_len = _min_match_len(patterns)
+    if min_len <= 1:
+        return prefilter  # scan() already passes empty bodies
+    return lambda body: [] if len(body) < min_len else prefilter(body)
+
+
+# Rebound with the rule set by load_patterns().
+_candidates: Callable[[str], Sequence[_Regex]] = _specialize((), None, None)
+
+
 def reload_patterns() -> int:
     """Reload patterns from the configured directory.  Intended for the admin endpoint."""
     return load_patterns()
 
 
+def clear_pattern_cache() -> None:
+    """Forget every cached compiled rule so the next load recompiles from source.
+
+    ``reload_patterns()`` keeps the cache; the SIGHUP handler clears it first.
+    """
+    _compile_rule.cache_clear()
+    _ascii_lowered_rule.cache_clear()
+
+
 # --------------------------------------------------------------------------- #
 #  AI engine                                                                    #
 # --------------------------------------------------------------------------- #
@@ -120,6 +630,10 @@ _ai_pipeline = None  # type: ignore[assignment]
 _ai_executor: ThreadPoolExecutor | None = None
 
 
+# Inference never runs on the event loop: _AIBatcher hands batches to this
+# pool, whose size is the cap on concurrent inferences (extra calls queue
+# in the executor).  The default of 1 leaves torch's own intra-op threads
+# to use the cores.
 _AI_MAX_WORKERS = int(os.environ.get("AI_MAX_WORKERS", "1"))
 
 
@@ -145,38 +659,150 @@ def init_detector() -> None:
         _ai_pipeline = None
 
 
-def _run_ai(text: str) -> float:
-    """Run AI inference synchronously.  Returns the injection confidence score."""
+# Concurrent scans are coalesced into one pipeline call of up to
+# AI_BATCH_MAX_SIZE texts, waiting at most AI_BATCH_MAX_LATENCY_MS for the
+# batch to fill.  AI_BATCH_MAX_SIZE=1 dispatches every text on its own.
+_AI_BATCH_MAX_SIZE = max(1, int(os.environ.get("AI_BATCH_MAX_SIZE", "8")))
+_AI_BATCH_MAX_LATENCY_SECS = float(os.environ.get("AI_BATCH_MAX_LATENCY_MS", "20")) / 1000
+
+
+def _injection_score(result: dict) -> float:
+    label = result.get("label", "").upper()
+    score = float(result.get("score", 0.0))
+    # The model returns INJECTION or SAFE labels
+    if "INJECTION" in label:
+        return score
+    # If the label is SAFE, the injection score is 1 - safe_score
+    return 1.0 - score
+
+
+def _run_ai_batch(texts: list[str]) -> list[float]:
+    """Run AI inference on *texts* as one padded batch.  Returns one score per text.
+
+    If the batch raises or returns the wrong number of results, each text is
+    re-run alone, so only the text at fault fails open (scores 0.0) rather
+    than every request coalesced with it.
+    """
     if _ai_pipeline is None:
-        return 0.0
+        return [0.0] * len(texts)
     try:
-        results = _ai_pipeline(text)
-        if results and isinstance(results, list):
-            result = results[0]
-            label = result.get("label", "").upper()
-            score = float(result.get("score", 0.0))
-            # The model returns INJECTION or SAFE labels
-            if "INJECTION" in label:
-                return score
-            # If the label is SAFE, the injection score is 1 - safe_score
-            return 1.0 - score
-        return 0.0
+        results = _ai_pipeline(texts, batch_size=len(texts))
+        if not isinstance(results, list) or len(results) != len(texts):
+            raise ValueError(f"pipeline returned {results!r:.80} for {len(texts)} texts")
+        return [_injection_score(r) for r in results]
     except Exception as exc:
+        if len(texts) > 1:
+            return [_run_ai_batch([text])[0] for text in texts]
         _log.warning("AI inference error: %s", exc)
-        return 0.0
+        return [0.0]
+
+
+def _run_ai(text: str) -> float:
+    """Run AI inference synchronously.  Returns the injection confidence score."""
+    return _run_ai_batch([text])[0]
+
+
+class _AIBatcher:
+    """Coalesce AI scans issued on one event loop into batched executor calls.
+
+    The first text in an empty batch arms a timer of
+    ``_AI_BATCH_MAX_LATENCY_SECS``; the batch is dispatched when the timer
+    fires or it reaches ``_AI_BATCH_MAX_SIZE``, whichever comes first.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self._pending: list[tuple[str, asyncio.Future[float]]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def score(self, text: str) -> float:
+        fut: asyncio.Future[float] = self.loop.create_future()
+        self._pending.append((text, fut))
+        if len(self._pending) >= _AI_BATCH_MAX_SIZE:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self.loop.call_later(_AI_BATCH_MAX_LATENCY_SECS, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self.loop.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: list[tuple[str, asyncio.Future[float]]]) -> None:
+        try:
+            scores = await self.loop.run_in_executor(
+                _ai_executor, _run_ai_batch, [text for text, _ in batch],
+            )
+        except Exception as exc:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for (_, fut), score in zip(batch, scores):
+            if not fut.done():
+                fut.set_result(score)
+
+
+_ai_batcher: Optional[_AIBatcher] = None
+
+
+def _get_ai_batcher() -> _AIBatcher:
+    """Return the batcher for the running loop, replacing one bound to an old loop."""
+    global _ai_batcher
+    loop = asyncio.get_running_loop()
+    if _ai_batcher is None or _ai_batcher.loop is not loop:
+        _ai_batcher = _AIBatcher(loop)
+    return _ai_batcher
 
 
 # --------------------------------------------------------------------------- #
 #  DetectionResult + scan()                                                     #
 # --------------------------------------------------------------------------- #
 
-@dataclass
+# One result is built per scanned message; slot it where dataclass supports it (3.10+).
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class DetectionResult:
     """Result of scanning a body through the detection engines."""
     action: str  # "pass", "monitor", "redact", "block"
     engine: Optional[str] = None  # "regex", "ai", or None
     detail: Optional[str] = None  # matched pattern or confidence score
-    body: str = ""  # the (possibly redacted) body to forward
+    body: str = ""  # the (possibly redacted) body to forward; "" on pass
+
+
+# Returned by scan()/scan_bytes() for every pass, so the common path
+# allocates nothing.  Its body is empty: on pass, forward the original.
+_PASS = DetectionResult(action="pass")
+
+
+def _redact_from(
+    pattern: _Regex, body: str, start: int, haystack: Optional[str] = None,
+) -> str:
+    """Replace every match of *pattern* in *body* with the placeholder.
+
+    Same result as ``re``'s ``pattern.sub(_REDACTION_PLACEHOLDER, body)``,
+    but the search resumes at *start* (the first match, already found by the
+    caller) rather than re-walking the prefix, and the output is spliced in
+    one join.  With *haystack* (``body.lower()`` for a lowered rule), matches
+    are found there and the offsets cut *body*.
+    """
+    parts: list[str] = []
+    pos = 0
+    for m in pattern.finditer(body if haystack is None else haystack, start):
+        parts.append(body[pos:m.start()])
+        parts.append(_REDACTION_PLACEHOLDER)
+        pos = m.end()
+    parts.append(body[pos:])
+    return "".join(parts)
 
 
 async def scan(
@@ -188,17 +814,15 @@ async def scan(
     """Scan *body* through regex and AI engines per *dest_config* modes.
 
     Returns a :class:`DetectionResult` describing the action to take and the
-    (possibly redacted) body.  When both engines trigger, the **stricter mode
-    wins** (block > redact > monitor).
+    (possibly redacted) body; a pass is the shared ``_PASS`` result, whose
+    body is empty, so forward the original.  When both engines trigger, the
+    **stricter mode wins** (block > redact > monitor).
     """
-    if not body:
-        return DetectionResult(action="pass", body=body)
-
     regex_mode = dest_config.regex_mode
     ai_mode = dest_config.ai_mode
 
-    if regex_mode == "off" and ai_mode == "off":
-        return DetectionResult(action="pass", body=body)
+    if (regex_mode == "off" and ai_mode == "off") or not body:
+        return _PASS
 
     best_action = "pass"
     best_engine: Optional[str] = None
@@ -207,39 +831,56 @@ async def scan(
 
     # --- Regex pass ---
     if regex_mode != "off":
-        # Copy the list reference so we don't hold the lock during matching.
-        with _patterns_lock:
-            current_patterns = _patterns
-
-        for pattern in current_patterns:
-            if pattern.search(body):
-                if _MODE_SEVERITY.get(regex_mode, 0) > _MODE_SEVERITY.get(best_action, 0):
-                    best_action = regex_mode
-                    best_engine = "regex"
-                    best_detail = pattern.pattern
-                    if regex_mode == "redact":
-                        result_body = pattern.sub(_REDACTION_PLACEHOLDER, body)
+        # One prefilter pass over the body for the common no-match case; on
+        # a hit the ordered loop below picks the first listed pattern.
+        ascii_body = body.isascii()
+        folded: Optional[str] = None
+        for pattern in _candidates(body):
+            # ASCII bodies are lowercased once and searched case-sensitively.
+            lowered = (
+                _ascii_lowered_rule(pattern.pattern)
+                if ascii_body and isinstance(pattern, re.Pattern) else None
+            )
+            if lowered is not None:
+                if folded is None:
+                    folded = body.lower()
+                first = lowered.search(folded)
+            else:
+                first = pattern.search(body)
+            if first:
+                # Nothing has fired yet, so any non-off mode (validated by
+                # load_config) outranks "pass" without a severity lookup.
+                best_action = regex_mode
+                best_engine = "regex"
+                best_detail = pattern.pattern
+                if regex_mode == "redact":
+                    result_body = (
+                        _redact_from(lowered, body, first.start(), folded)
+                        if lowered is not None
+                        else _redact_from(pattern, body, first.start())
+                    )
                 break  # stop on first match
 
     # --- AI pass ---
     if ai_mode != "off" and best_action != "block":
+        body_len = len(body)
         if _ai_pipeline is None:
             pass  # AI unavailable; skip silently
-        elif len(body) > dest_config.ai_max_chars:
+        elif body_len > dest_config.ai_max_chars:
+            # Checked before any inference work; the body is never sliced.
             _log.warning(
                 "AI scan skipped: body exceeds %d chars (%d)",
-                dest_config.ai_max_chars, len(body),
+                dest_config.ai_max_chars, body_len,
             )
         else:
-            loop = asyncio.get_running_loop()
-            score = await loop.run_in_executor(_ai_executor, _run_ai, body)
+            score = await _get_ai_batcher().score(body)
             threshold = (
                 dest_config.ai_threshold
                 if dest_config.ai_threshold is not None
                 else AI_INJECTION_THRESHOLD
             )
             if score >= threshold:
-                if _MODE_SEVERITY.get(ai_mode, 0) > _MODE_SEVERITY.get(best_action, 0):
+                if _MODE_SEVERITY[ai_mode] > _MODE_SEVERITY[best_action]:
                     best_action = ai_mode
                     best_engine = "ai"
                     best_detail = f"score={score:.3f}"
@@ -252,8 +893,35 @@ async def scan(
         )
 
     if best_action == "pass":
-        return DetectionResult(action="pass", body=body)
+        return _PASS
 
     return DetectionResult(
         action=best_action, engine=best_engine, detail=best_detail, body=result_body,
     )
+
+
+async def scan_bytes(
+    body: bytes,
+    dest_config: DestinationConfig,
+    *,
+    is_response: bool = False,
+) -> DetectionResult:
+    """Decode *body* and :func:`scan` it, unless it can be passed undecoded.
+
+    That is the case when both engines are off, or when only the regex engine
+    is on, the Hyperscan prefilter is loaded and an ASCII body (so valid
+    UTF-8) has no candidate rule.
+    """
+    if dest_config.ai_mode == "off":
+        if dest_config.regex_mode == "off":
+            return _PASS
+        with _patterns_lock:
+            current_patterns = _patterns
+            hs_prefilter = _hs_prefilter
+        if (
+            hs_prefilter is not None
+            and body.isascii()
+            and not hs_prefilter.candidates(body, current_patterns)
+        ):
+            return _PASS
+    return await scan(body.decode(errors="replace"), dest_config, is_response=is_response)
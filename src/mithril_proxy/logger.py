@@ -2,13 +2,23 @@
 
 from __future__ import annotations
 
+import codecs
 import json
 import logging
 import os
 import threading
+import time
+from collections import deque
+from contextvars import ContextVar, Token
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional
+
+try:
+    import orjson as _orjson
+except ImportError:  # optional — fall back to the stdlib encoder
+    _orjson = None  # type: ignore[assignment]
 
 _LOG_FILE_ENV = "LOG_FILE"
 _DEFAULT_LOG_FILE = Path("/var/log/mithril-proxy/proxy.log")
@@ -21,13 +31,63 @@ _write_lock = threading.Lock()
 
 _logger: Optional[logging.Logger] = None
 
+# Per-request identity fields, set once at ingress by the app middleware so
+# handlers don't have to thread user/source_ip/destination into every
+# log_request() call.  Explicit kwargs still take precedence.
+_EMPTY_REQUEST_CONTEXT: Mapping[str, Optional[str]] = MappingProxyType(
+    {"user": "anonymous", "source_ip": "unknown", "destination": None}
+)
+_request_context: ContextVar[Mapping[str, Optional[str]]] = ContextVar(
+    "mithril_proxy_request_context", default=_EMPTY_REQUEST_CONTEXT
+)
+
+# (epoch_ms, iso_string) of the last formatted timestamp.  Bursts of records
+# within the same millisecond reuse the string instead of re-formatting.
+# Replaced as a whole tuple so concurrent formatters never see a torn pair.
+_ts_cache: tuple[int, str] = (-1, "")
+
+
+def _timestamp(created: float) -> str:
+    """Return the ISO-8601 UTC timestamp (millisecond precision) for *created*."""
+    global _ts_cache
+    epoch_ms = int(created * 1000)
+    cached_ms, cached_str = _ts_cache
+    if epoch_ms != cached_ms:
+        cached_str = datetime.fromtimestamp(epoch_ms / 1000, timezone.utc).isoformat(
+            timespec="milliseconds"
+        )
+        _ts_cache = (epoch_ms, cached_str)
+    return cached_str
+
+
+def _dumps(payload: dict[str, Any], newline: bool = False) -> bytes:
+    """Serialize *payload* to compact UTF-8 JSON, via orjson when installed.
+
+    With *newline*, a trailing ``\\n`` is written by the encoder itself rather
+    than by copying the result.
+    """
+    if _orjson is not None:
+        option = _orjson.OPT_NON_STR_KEYS
+        if newline:
+            option |= _orjson.OPT_APPEND_NEWLINE
+        try:
+            return _orjson.dumps(payload, default=str, option=option)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits — let the stdlib encoder handle them
+    text = json.dumps(payload, default=str)
+    return (text + "\n" if newline else text).encode("utf-8")
+
 
 class _JsonFormatter(logging.Formatter):
     """Serialize a LogRecord to a single JSON line."""
 
     def format(self, record: logging.LogRecord) -> str:  # type: ignore[override]
+        return self.format_bytes(record).decode("utf-8")
+
+    def format_bytes(self, record: logging.LogRecord, newline: bool = False) -> bytes:
+        """Like :meth:`format`, but return the encoded line (``\\n``-terminated with *newline*)."""
         payload: dict[str, Any] = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": _timestamp(record.created),
             "level": record.levelname,
             "message": record.getMessage(),
         }
@@ -46,13 +106,248 @@ class _JsonFormatter(logging.Formatter):
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
 
-        return json.dumps(payload, default=str)
+        return _dumps(payload, newline)
+
+
+class _AuditFileHandler(logging.Handler):
+    """Append formatted records to *path* with one ``os.write`` per line.
+
+    Skips ``FileHandler``'s text-stream layer (encode buffer + flush per
+    record).  The fd is opened ``O_APPEND`` so each line lands at end-of-file
+    in a single write, which keeps lines whole even with other appenders.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        super().__init__()
+        # 0o640: audit bodies may contain sensitive payloads (see SETUP.md).
+        self._fd: Optional[int] = os.open(
+            str(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o640
+        )
+
+    def _write_all(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view and self._fd is not None:
+            written = os.write(self._fd, view)
+            view = view[written:]
+
+    def _format_line(self, record: logging.LogRecord) -> bytes:
+        formatter = self.formatter
+        if isinstance(formatter, _JsonFormatter):
+            return formatter.format_bytes(record, newline=True)
+        return (self.format(record) + "\n").encode("utf-8")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._write_all(self._format_line(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            self.release()
+        super().close()
+
+
+class _StagingHandler(_AuditFileHandler):
+    """Stage records in memory and let a drain thread format and write them.
+
+    ``emit()`` only appends the record to a deque, so request handlers never
+    pay for JSON serialization or a blocking ``write()``.  A daemon thread
+    pops records in batches of up to ``batch_max``, formats them and appends
+    the batch with a single ``os.writev``.  One drain thread keeps lines in
+    emit order.  When ``max_staged`` records are waiting, ``emit()`` blocks
+    until the drain catches up rather than dropping audit lines.
+
+    After waking for a partial batch the drain lingers up to ``linger``
+    seconds for more records, so bursts share one syscall.  ``flush()`` and
+    ``close()`` cut the linger short.  Records still staged at interpreter
+    exit are written by ``logging.shutdown()``, which flushes and closes
+    every live handler, so the daemon thread never drops them.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        *,
+        batch_max: int = 256,
+        max_staged: int = 10_000,
+        linger: float = 0.005,
+    ) -> None:
+        super().__init__(path)
+        self._batch_max = batch_max
+        self._max_staged = max_staged
+        self._linger = linger
+        self._staged: deque[logging.LogRecord] = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._flush_waiters = 0
+        self._closing = False
+        self._drain_thread = threading.Thread(
+            target=self._drain, name="mithril-proxy-log-drain", daemon=True,
+        )
+        self._drain_thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        with self._cond:
+            while len(self._staged) >= self._max_staged and not self._closing:
+                self._cond.wait()
+            self._staged.append(record)
+            # Wake the drain only when it is idle or a full batch is ready;
+            # anything in between is picked up when the linger expires.
+            if len(self._staged) == 1 or len(self._staged) >= self._batch_max:
+                self._cond.notify_all()
+
+    def _drain(self) -> None:
+        while True:
+            with self._cond:
+                while not self._staged and not self._closing:
+                    self._cond.wait()
+                if not self._staged:
+                    return  # closing and fully drained
+                self._linger_for_batch()
+                batch = [
+                    self._staged.popleft()
+                    for _ in range(min(len(self._staged), self._batch_max))
+                ]
+                self._in_flight = len(batch)
+                self._cond.notify_all()  # wake producers blocked on max_staged
+
+            lines: list[bytes] = []
+            for record in batch:
+                try:
+                    lines.append(self._format_line(record))
+                except Exception:
+                    self.handleError(record)
+            try:
+                self._writev_all(lines)
+            except Exception:
+                for record in batch:
+                    self.handleError(record)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _linger_for_batch(self) -> None:
+        """Wait (holding ``_cond``) up to ``linger`` for a fuller batch."""
+        deadline = time.monotonic() + self._linger
+        while (
+            len(self._staged) < self._batch_max
+            and not self._closing
+            and not self._flush_waiters
+        ):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._cond.wait(remaining)
+
+    def _writev_all(self, lines: list[bytes]) -> None:
+        if not lines or self._fd is None:
+            return
+        written = os.writev(self._fd, lines)
+        total = sum(len(line) for line in lines)
+        if written < total:
+            # Short write (rare for regular files) — finish with plain writes.
+            self._write_all(b"".join(lines)[written:])
+
+    def flush(self) -> None:
+        """Block until every record staged so far has been written."""
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                while (self._staged or self._in_flight) and self._drain_thread.is_alive():
+                    self._cond.wait()
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._drain_thread is not threading.current_thread():
+            self._drain_thread.join()
+        super().close()
 
 
 def _audit_enabled() -> bool:
     return os.environ.get(_AUDIT_LOG_BODIES_ENV, "true").lower() not in ("false", "0", "no")
 
 
+def _make_body_truncator(limit: int) -> Callable[[str | bytes], tuple[str, bool]]:
+    """Build the body truncator with *limit* and its helpers bound as locals."""
+    # A code point is at most 4 UTF-8 bytes, so strings this short can't
+    # exceed the limit and skip the encode.
+    safe_chars = limit // 4
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")
+
+    def truncate_body(value: str | bytes) -> tuple[str, bool]:
+        """Cap *value* at *limit* bytes of UTF-8, cutting on a character boundary.
+
+        *value* may be the raw body bytes, in which case only the kept prefix
+        is decoded.  Returns ``(body, truncated)``.
+        """
+        if isinstance(value, str):
+            if len(value) <= safe_chars:
+                return value, False
+            raw = value.encode("utf-8", errors="replace")
+            if len(raw) <= limit:
+                return value, False
+        else:
+            raw = value
+            if len(raw) <= limit:
+                return raw.decode("utf-8", errors="replace"), False
+        # A non-final incremental decode holds back a multi-byte character
+        # split by the cut instead of emitting U+FFFD for it.
+        return utf8_decoder(errors="replace").decode(memoryview(raw)[:limit]), True
+
+    return truncate_body
+
+
+_truncate_body = _make_body_truncator(_AUDIT_MAX_BYTES)
+
+
+def _add_bodies(
+    extra: dict[str, Any],
+    request_body: Optional[str | bytes],
+    response_body: Optional[str | bytes],
+) -> None:
+    """Attach request/response bodies to *extra*, truncating at 32 KB."""
+    for field_name, value in (("request_body", request_body), ("response_body", response_body)):
+        if value is not None:
+            body, truncated = _truncate_body(value)
+            extra[field_name] = body
+            if truncated:
+                extra["truncated"] = True
+
+
+def _skip_bodies(
+    extra: dict[str, Any],
+    request_body: Optional[str | bytes],
+    response_body: Optional[str | bytes],
+) -> None:
+    """Body handler used when AUDIT_LOG_BODIES is off — bodies are dropped."""
+
+
+# Body handler used by log_request(); rebound by reload_flags() so the
+# disabled case skips truncation entirely instead of re-checking the flag.
+_body_handler = _add_bodies
+
+
+def reload_flags() -> None:
+    """Re-read AUDIT_LOG_BODIES and select the matching body handler."""
+    global _body_handler
+    _body_handler = _add_bodies if _audit_enabled() else _skip_bodies
+
+
+reload_flags()
+
+
 def _resolve_log_path() -> Path:
     env_val = os.environ.get(_LOG_FILE_ENV)
     return Path(env_val) if env_val else _DEFAULT_LOG_FILE
@@ -62,10 +357,12 @@ def setup_logging() -> None:
     """Configure the JSON file logger.  Call once at startup."""
     global _logger
 
+    reload_flags()
+
     log_path = _resolve_log_path()
     log_path.parent.mkdir(parents=True, exist_ok=True)
 
-    handler = logging.FileHandler(log_path, mode="a", encoding="utf-8")
+    handler = _StagingHandler(log_path)
     handler.setFormatter(_JsonFormatter())
 
     logger = logging.getLogger("mithril_proxy")
@@ -77,6 +374,33 @@ def setup_logging() -> None:
     _logger = logger
 
 
+def set_request_context(
+    *, user: str, source_ip: str, destination: Optional[str],
+) -> Token:
+    """Bind the identity fields used by log_request() for the current request.
+
+    Returns the token to pass to :func:`reset_request_context`.
+    """
+    return _request_context.set(
+        {"user": user, "source_ip": source_ip, "destination": destination}
+    )
+
+
+def reset_request_context(token: Token) -> None:
+    """Restore the request context that was active before *token* was set."""
+    _request_context.reset(token)
+
+
+def shutdown_logging() -> None:
+    """Flush staged log records and close the handlers installed by setup_logging()."""
+    if _logger is None:
+        return
+    for handler in list(_logger.handlers):
+        if isinstance(handler, _StagingHandler):
+            handler.close()
+            _logger.removeHandler(handler)
+
+
 def get_logger() -> logging.Logger:
     if _logger is None:
         raise RuntimeError("setup_logging() has not been called.")
@@ -85,22 +409,33 @@ def get_logger() -> logging.Logger:
 
 def log_request(
     *,
-    user: str,
-    source_ip: str,
-    destination: str,
+    user: Optional[str] = None,
+    source_ip: Optional[str] = None,
+    destination: Optional[str] = None,
     mcp_method: Optional[str],
     status_code: int,
     latency_ms: float,
     error: Optional[str] = None,
     rpc_id=None,
-    request_body: Optional[str] = None,
-    response_body: Optional[str] = None,
+    request_body: Optional[str | bytes] = None,
+    response_body: Optional[str | bytes] = None,
     detection_action: Optional[str] = None,
     detection_engine: Optional[str] = None,
     detection_detail: Optional[str] = None,
 ) -> None:
-    """Write one structured JSON log line for a proxied request."""
+    """Write one structured JSON log line for a proxied request.
+
+    *user*, *source_ip* and *destination* default to the values bound by
+    :func:`set_request_context` for the current request.
+    """
     logger = get_logger()
+    ctx = _request_context.get()
+    if user is None:
+        user = ctx["user"]
+    if source_ip is None:
+        source_ip = ctx["source_ip"]
+    if destination is None:
+        destination = ctx["destination"]
     extra: dict[str, Any] = {
         "user": user,
         "source_ip": source_ip,
@@ -122,14 +457,15 @@ def log_request(
     if detection_detail is not None:
         extra["detection_detail"] = detection_detail[:_AUDIT_MAX_BYTES]
 
-    if _audit_enabled():
-        for field_name, value in (("request_body", request_body), ("response_body", response_body)):
-            if value is not None:
-                if len(value) > _AUDIT_MAX_BYTES:
-                    extra[field_name] = value[:_AUDIT_MAX_BYTES]
-                    extra["truncated"] = True
-                else:
-                    extra[field_name] = value
+    _body_handler(extra, request_body, response_body)
 
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    # Build the record directly rather than via logger.info(): every line has
+    # the same shape, and the caller lookup info() does (a stack walk) only
+    # fills file/line fields _JsonFormatter drops anyway.
+    record = logger.makeRecord(
+        logger.name, logging.INFO, "(unknown file)", 0, "request", (), None, extra=extra,
+    )
     with _write_lock:
-        logger.info("request", extra=extra)
+        logger.handle(record)
@@ -13,9 +13,15 @@ load_dotenv()
 from fastapi.responses import JSONResponse
 
 from .bridge import init_bridge, shutdown_all_stdio, validate_stdio_commands
-from .config import get_stdio_destinations, load_config
-from .detector import init_detector, load_patterns, reload_patterns
-from .logger import setup_logging
+from .config import get_destination, get_stdio_destinations, load_config
+from .detector import clear_pattern_cache, init_detector, load_patterns, reload_patterns
+from .logger import (
+    reload_flags,
+    reset_request_context,
+    set_request_context,
+    setup_logging,
+    shutdown_logging,
+)
 from .proxy import (
     handle_message,
     handle_sse,
@@ -24,7 +30,13 @@ from .proxy import (
     handle_streamable_http_post,
 )
 from .secrets import load_secrets
-from .utils import source_ip as _source_ip
+from .utils import source_ip as _source_ip, user_from_request as _user_from_request
+
+
+def _reload_on_sighup() -> None:
+    reload_flags()
+    clear_pattern_cache()
+    reload_patterns()
 
 
 @asynccontextmanager
@@ -45,19 +57,54 @@ async def lifespan(app: FastAPI):
     init_bridge()
     validate_stdio_commands(get_stdio_destinations())
 
-    # Register SIGHUP to reload regex patterns without restart.
+    # Register SIGHUP to reload regex patterns and the cached
+    # AUDIT_LOG_BODIES flag without restart.
     # Use loop.add_signal_handler (not signal.signal) to avoid deadlock:
     # signal.signal handlers interrupt the thread and can deadlock if the
     # thread already holds the patterns lock.
     loop = asyncio.get_running_loop()
-    loop.add_signal_handler(signal.SIGHUP, reload_patterns)
+    loop.add_signal_handler(signal.SIGHUP, _reload_on_sighup)
 
     yield
-    # Shutdown: terminate all managed stdio subprocesses
+    # Shutdown: terminate all managed stdio subprocesses, then flush the
+    # log drain so their final lines reach disk.
     await shutdown_all_stdio()
+    shutdown_logging()
+
+
+class _RequestContextMiddleware:
+    """Bind user/source_ip/destination for log_request() once per request.
+
+    Plain ASGI middleware (not BaseHTTPMiddleware) so streaming responses run
+    in the same context and are not buffered.  The destination is the first
+    segment of ``/{destination}/{endpoint}`` paths, and only when that segment
+    names a configured destination (so ``/admin/reload-patterns`` is not tagged).  Stdio
+    destinations log under the fixed user ``"stdio"``.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        segments = scope["path"].strip("/").split("/")
+        dest = get_destination(segments[0]) if len(segments) == 2 else None
+        token = set_request_context(
+            user="stdio" if dest is not None and dest.type == "stdio" else _user_from_request(request),
+            source_ip=_source_ip(request),
+            destination=segments[0] if dest is not None else None,
+        )
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_request_context(token)
 
 
 app = FastAPI(title="mithril-proxy", lifespan=lifespan)
+app.add_middleware(_RequestContextMiddleware)
 
 
 @app.get("/health")
@@ -8,17 +8,33 @@ import logging
 import os
 import re
 import time
-from typing import AsyncIterator, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
 
 import httpx
 from fastapi import Request
 from fastapi.responses import JSONResponse, Response, StreamingResponse
 
+try:
+    # Optional: lazy JSON access so method/id extraction skips ``params``.
+    import simdjson as _simdjson  # type: ignore[import-untyped]
+except ImportError:  # pragma: no cover - depends on environment
+    _simdjson = None
+
+try:
+    # Optional: typed decode of just the envelope fields when simdjson is absent.
+    import msgspec as _msgspec
+except ImportError:  # pragma: no cover - depends on environment
+    _msgspec = None
+
 from .config import get_destination
-from .detector import scan as detector_scan
+from .detector import scan_bytes as detector_scan_bytes
 from .logger import log_request
-from .utils import detection_log_kwargs as _detection_log_kwargs, source_ip as _source_ip
+from .utils import (
+    detection_log_kwargs as _detection_log_kwargs,
+    json_first_byte,
+    read_body,
+)
 
 _log = logging.getLogger("mithril_proxy")
 
@@ -38,6 +54,137 @@ def _jsonrpc_error_response(code: int, message: str, rpc_id, status_code: int =
         },
     )
 
+
+_JSON_SCALARS = (str, int, float, bool)
+
+# Fast path for the common envelope shape: escape-free string method, and an
+# integer, escape-free string or null id.  Anything else falls back to a parse.
+_RPC_METHOD_RE = re.compile(rb'"method"\s*:\s*"([^"\\]{1,128})"')
+_RPC_ID_RE = re.compile(
+    rb'"id"\s*:\s*(-?(?:0|[1-9][0-9]{0,17})(?=\s*[,}])|"[^"\\]{0,128}"|null)'
+)
+# JSON parsers keep the last of duplicate keys; a repeat sends us to one.
+_RPC_METHOD_KEY_RE = re.compile(rb'"method"\s*:')
+_RPC_ID_KEY_RE = re.compile(rb'"id"\s*:')
+
+# Reused across calls; safe because the proxy runs on a single event loop and
+# no parsed document outlives _jsonrpc_method_and_id().
+_simdjson_parser = _simdjson.Parser() if _simdjson is not None else None
+
+if _msgspec is not None:
+    class _RpcEnvelope(_msgspec.Struct, frozen=True):
+        """The two JSON-RPC fields we log; other keys are skipped, not built."""
+
+        method: Any = None
+        id: Any = None
+
+    _envelope_decoder = _msgspec.json.Decoder(_RpcEnvelope)
+else:  # pragma: no cover - depends on environment
+    _envelope_decoder = None
+
+
+def _stdlib_method_and_id(body: bytes) -> tuple[Optional[str], Any]:
+    """Parse *body* with :mod:`json`; the fallback every other backend shares."""
+    try:
+        payload = json.loads(body)
+    except Exception:  # noqa: BLE001 - also RecursionError on deep nesting
+        return None, None
+    return payload.get("method"), payload.get("id")
+
+
+def _jsonrpc_method_and_id(body: bytes) -> tuple[Optional[str], Any]:
+    """Return ``(method, id)`` from a JSON-RPC body.
+
+    Both are logged, and the id is echoed back in the error response for a
+    blocked request.  Any body that fails to parse yields ``(None, None)``,
+    never an exception: a malformed or pathologically nested client body
+    must not turn into a 500.
+
+    Bodies whose first non-whitespace byte is not ``{`` cannot be a JSON-RPC
+    envelope, so they return ``(None, None)`` without invoking the parser.
+    Envelopes whose ``method`` and ``id`` precede ``params`` are answered by
+    :func:`_scan_method_and_id` without parsing at all.  Otherwise, with
+    ``pysimdjson`` or ``msgspec`` installed only the two top-level leaves are
+    materialized; ``params`` is never converted to Python objects.
+    """
+    if json_first_byte(body) != b"{":
+        return None, None
+    fast = _scan_method_and_id(body)
+    if fast is not None:
+        return fast
+    if _simdjson_parser is not None:
+        try:
+            doc = _simdjson_parser.parse(body)
+        except Exception:  # noqa: BLE001 - RuntimeError on integers past 64 bits
+            return _stdlib_method_and_id(body)
+        keys = list(doc.keys())
+        # simdjson's get() returns the first of duplicate keys; json, msgspec
+        # and the upstream keep the last.
+        if keys.count("method") > 1 or keys.count("id") > 1:
+            del doc
+            return _stdlib_method_and_id(body)
+        method = doc.get("method")
+        rpc_id = doc.get("id")
+        del doc  # release the parser before it is reused
+    elif _envelope_decoder is not None:
+        try:
+            envelope = _envelope_decoder.decode(body)
+        except _msgspec.DecodeError:
+            return None, None
+        except Exception:  # noqa: BLE001 - RecursionError on deep nesting
+            return _stdlib_method_and_id(body)
+        method, rpc_id = envelope.method, envelope.id
+    else:
+        return _stdlib_method_and_id(body)
+
+    # Objects/arrays borrow simdjson's buffer; neither is valid here anyway.
+    if not isinstance(method, str):
+        method = None
+    if rpc_id is not None and not isinstance(rpc_id, _JSON_SCALARS):
+        rpc_id = None
+    return method, rpc_id
+
+
+def _scan_method_and_id(body: bytes) -> Optional[tuple[str, Any]]:
+    """Regex-extract ``(method, id)`` without parsing, or None if unsure.
+
+    Only the text before the first nested ``{`` or ``[`` is searched, so a
+    match is always a top-level key (keys inside ``params`` can't match).
+    The body is not validated, but a second ``"method"`` or ``"id"`` key
+    after the match returns None: the upstream's parser would take the last
+    one, and the audit log and error responses must agree with it.
+    """
+    start = body.find(b"{") + 1
+    end = len(body)
+    for opener in (b"{", b"["):
+        pos = body.find(opener, start, end)
+        if pos != -1:
+            end = pos
+    method_match = _RPC_METHOD_RE.search(body, start, end)
+    if method_match is None:
+        return None
+    id_match = _RPC_ID_RE.search(body, start, end)
+    if id_match is None:
+        return None
+    if (
+        _RPC_METHOD_KEY_RE.search(body, method_match.end(), end)
+        or _RPC_ID_KEY_RE.search(body, id_match.end(), end)
+    ):
+        return None
+    try:
+        method = method_match.group(1).decode("utf-8")
+        raw_id = id_match.group(1)
+        if raw_id == b"null":
+            rpc_id: Any = None
+        elif raw_id.startswith(b'"'):
+            rpc_id = raw_id[1:-1].decode("utf-8")
+        else:
+            rpc_id = int(raw_id)
+    except UnicodeDecodeError:
+        return None
+    return method, rpc_id
+
+
 # --------------------------------------------------------------------------- #
 #  Session map: session_id → upstream message URL                             #
 # --------------------------------------------------------------------------- #
@@ -62,28 +209,18 @@ async def _get_session_url(session_id: str) -> Optional[str]:
 
 
 # --------------------------------------------------------------------------- #
-#  Helper: extract Bearer token prefix for log correlation                    #
+#  Upstream headers — pass everything except Host                             #
 # --------------------------------------------------------------------------- #
 
-def _user_from_request(request: Request) -> str:
-    auth = request.headers.get("authorization", "")
-    if auth.lower().startswith("bearer "):
-        token = auth[7:].strip()
-        return token[:8] if token else "anonymous"
-    return "anonymous"
-
-
+_REQUEST_HEADERS_TO_DROP = frozenset({"host", "content-length", "transfer-encoding"})
 
-# --------------------------------------------------------------------------- #
-#  Upstream headers — pass everything except Host                             #
-# --------------------------------------------------------------------------- #
 
 def _upstream_headers(request: Request) -> dict[str, str]:
-    skip = {"host", "content-length", "transfer-encoding"}
+    # ASGI delivers header names already lower-cased, so no .lower() per key.
     return {
         k: v
         for k, v in request.headers.items()
-        if k.lower() not in skip
+        if k not in _REQUEST_HEADERS_TO_DROP
     }
 
 
@@ -115,8 +252,15 @@ async def _connect_with_retries(
     client: httpx.AsyncClient,
     method: str,
     url: str,
+    *,
+    sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
     **kwargs,
 ) -> httpx.Response:
+    """Send the request, retrying connect errors and 5xx per ``_RETRY_DELAYS``.
+
+    *sleep* waits out each backoff; tests pass a stub to skip the delay.
+    Remaining keyword arguments go to ``client.request``.
+    """
     last_exc: Exception = RuntimeError("No attempts made")
     for attempt in range(len(_RETRY_DELAYS)):
         try:
@@ -127,7 +271,7 @@ async def _connect_with_retries(
         except (httpx.ConnectError, httpx.TimeoutException, httpx.RemoteProtocolError) as exc:
             last_exc = exc
         if attempt < len(_RETRY_DELAYS) - 1:
-            await asyncio.sleep(_RETRY_DELAYS[attempt])
+            await sleep(_RETRY_DELAYS[attempt])
     raise last_exc
 
 
@@ -136,6 +280,8 @@ async def _connect_with_retries(
 # --------------------------------------------------------------------------- #
 
 _SESSION_ID_RE = re.compile(r"[?&]sessionId=([^&\s]+)")
+# SSE line terminators: CRLF, CR, or LF.
+_SSE_LINE_END_RE = re.compile(r"\r\n|\r|\n")
 _ENDPOINT_URL_RE = re.compile(r"(https?://[^\s]+|/[^\s]*)")
 
 
@@ -171,8 +317,6 @@ async def handle_sse(request: Request, destination: str) -> Response:
 
     upstream_url = f"{upstream_base}/sse"
     headers = _upstream_headers(request)
-    user = _user_from_request(request)
-    source_ip = _source_ip(request)
     start = time.monotonic()
 
     async def event_stream() -> AsyncIterator[bytes]:
@@ -190,19 +334,35 @@ async def handle_sse(request: Request, destination: str) -> Response:
                         yield body
                         return
 
-                    # Buffer to accumulate SSE fields for one event
+                    # Only the endpoint event is rewritten.  Complete lines are
+                    # relayed as the upstream's raw bytes unless the block could
+                    # hold (part of) an endpoint event; those blocks are parsed
+                    # line by line.  A trailing partial line waits in *pending*.
+                    # Blocks end at CR or LF, so a CRLF may straddle two.  A
+                    # parsed block already re-terminated its last line, so
+                    # *after_cr* drops the LF half that starts the next one.
                     event_type: Optional[str] = None
-                    data_lines: list[str] = []
-
-                    async for raw_line in upstream.aiter_lines():
-                        if raw_line.startswith("event:"):
-                            event_type = raw_line[len("event:"):].strip()
-                            yield (raw_line + "\n").encode()
-
-                        elif raw_line.startswith("data:"):
-                            data_value = raw_line[len("data:"):].strip()
-
-                            if event_type == "endpoint":
+                    after_cr = False
+                    pending = bytearray()
+
+                    async def relay_block(block: bytes) -> AsyncIterator[bytes]:
+                        nonlocal event_type, session_id, after_cr
+                        if after_cr and block.startswith(b"\n"):
+                            block = block[1:]
+                        after_cr = False
+                        if event_type != "endpoint" and b"endpoint" not in block:
+                            event_type = None  # only "endpoint" is ever acted on
+                            if block:
+                                yield block
+                            return
+                        after_cr = block.endswith(b"\r")
+                        text = block.decode(errors="replace")
+                        for raw_line in _SSE_LINE_END_RE.split(text)[:-1]:
+                            if raw_line.startswith("event:"):
+                                event_type = raw_line[len("event:"):].strip()
+                            elif raw_line.startswith("data:") and event_type == "endpoint":
+                                event_type = None
+                                data_value = raw_line[len("data:"):].strip()
                                 # Extract sessionId from the upstream URL
                                 m = _SESSION_ID_RE.search(data_value)
                                 if m:
@@ -215,21 +375,25 @@ async def handle_sse(request: Request, destination: str) -> Response:
                                         data_value, destination, session_id
                                     )
                                     yield f"data: {rewritten}\n".encode()
-                                else:
-                                    yield (raw_line + "\n").encode()
+                                    continue
+                            elif raw_line == "":
+                                # Blank line = end of SSE event
                                 event_type = None
-                            else:
-                                yield (raw_line + "\n").encode()
-
-                        elif raw_line == "":
-                            # Blank line = end of SSE event
-                            event_type = None
-                            data_lines = []
-                            yield b"\n"
-
-                        else:
                             yield (raw_line + "\n").encode()
 
+                    async for chunk in upstream.aiter_bytes():
+                        pending += chunk
+                        cut = max(pending.rfind(b"\n"), pending.rfind(b"\r")) + 1
+                        if not cut:
+                            continue
+                        block = bytes(pending[:cut])
+                        del pending[:cut]
+                        async for out in relay_block(block):
+                            yield out
+                    if pending:
+                        async for out in relay_block(bytes(pending) + b"\n"):
+                            yield out
+
         except (httpx.ConnectError, httpx.TimeoutException) as exc:
             status_code = 502
             error_msg = str(exc)
@@ -242,9 +406,6 @@ async def handle_sse(request: Request, destination: str) -> Response:
             if session_id:
                 await _remove_session(session_id)
             log_request(
-                user=user,
-                source_ip=source_ip,
-                destination=destination,
                 mcp_method=None,
                 status_code=status_code,
                 latency_ms=latency_ms,
@@ -312,39 +473,28 @@ async def handle_message(
         )
 
     headers = _upstream_headers(request)
-    user = _user_from_request(request)
-    source_ip = _source_ip(request)
     start = time.monotonic()
 
-    body = await request.body()
-    request_body_str = body.decode(errors="replace")
+    body = await read_body(request)
+    if body is None:
+        return JSONResponse(status_code=413, content={"error": "Request body too large"})
 
     # Extract MCP method and rpc_id from JSON-RPC body for logging
-    mcp_method: Optional[str] = None
-    rpc_id = None
-    try:
-        import json
-        payload = json.loads(body)
-        mcp_method = payload.get("method")
-        rpc_id = payload.get("id")
-    except Exception:
-        pass
+    mcp_method, rpc_id = _jsonrpc_method_and_id(body)
 
     # --- Request scanning ---
     det_kwargs: dict = {}
-    req_scan = await detector_scan(request_body_str, dest_config)
+    req_scan = await detector_scan_bytes(body, dest_config)
     if req_scan.action == "block":
         latency_ms = (time.monotonic() - start) * 1000
         log_request(
-            user=user, source_ip=source_ip, destination=destination,
             mcp_method=mcp_method, status_code=400, latency_ms=latency_ms,
-            rpc_id=rpc_id, request_body=request_body_str,
+            rpc_id=rpc_id, request_body=body,
             **_detection_log_kwargs(req_scan),
         )
         return _jsonrpc_error_response(-32600, "Request blocked by injection filter", rpc_id)
     if req_scan.action != "pass":
         det_kwargs = _detection_log_kwargs(req_scan)
-        request_body_str = req_scan.body
         body = req_scan.body.encode()
 
     error_msg: Optional[str] = None
@@ -361,7 +511,6 @@ async def handle_message(
             )
             status_code = upstream_response.status_code
             response_body = upstream_response.content
-            response_body_str = response_body.decode(errors="replace")
             response_headers = dict(upstream_response.headers)
             # Strip hop-by-hop headers
             for h in ("transfer-encoding", "connection", "keep-alive"):
@@ -371,15 +520,12 @@ async def handle_message(
         error_msg = str(exc)
         latency_ms = (time.monotonic() - start) * 1000
         log_request(
-            user=user,
-            source_ip=source_ip,
-            destination=destination,
             mcp_method=mcp_method,
             status_code=status_code,
             latency_ms=latency_ms,
             error=error_msg,
             rpc_id=rpc_id,
-            request_body=request_body_str,
+            request_body=body,
             **det_kwargs,
         )
         return JSONResponse(
@@ -388,33 +534,28 @@ async def handle_message(
         )
 
     # --- Response scanning ---
-    resp_scan = await detector_scan(response_body_str, dest_config, is_response=True)
+    resp_scan = await detector_scan_bytes(response_body, dest_config, is_response=True)
     if resp_scan.action == "block":
         latency_ms = (time.monotonic() - start) * 1000
         log_request(
-            user=user, source_ip=source_ip, destination=destination,
             mcp_method=mcp_method, status_code=status_code, latency_ms=latency_ms,
-            rpc_id=rpc_id, request_body=request_body_str,
+            rpc_id=rpc_id, request_body=body,
             **_detection_log_kwargs(resp_scan),
         )
         return _jsonrpc_error_response(-32603, "Response blocked by injection filter", rpc_id)
     if resp_scan.action != "pass":
         det_kwargs.update(_detection_log_kwargs(resp_scan))
-        response_body_str = resp_scan.body
         response_body = resp_scan.body.encode()
 
     latency_ms = (time.monotonic() - start) * 1000
     log_request(
-        user=user,
-        source_ip=source_ip,
-        destination=destination,
         mcp_method=mcp_method,
         status_code=status_code,
         latency_ms=latency_ms,
         error=error_msg,
         rpc_id=rpc_id,
-        request_body=request_body_str,
-        response_body=response_body_str,
+        request_body=body,
+        response_body=response_body,
         **det_kwargs,
     )
 
@@ -470,37 +611,27 @@ async def handle_streamable_http_post(
 
     upstream_url = dest_config.url
     headers = _upstream_headers(request)
-    user = _user_from_request(request)
-    source_ip = _source_ip(request)
     start = time.monotonic()
 
-    body = await request.body()
-    request_body_str = body.decode(errors="replace")
+    body = await read_body(request)
+    if body is None:
+        return JSONResponse(status_code=413, content={"error": "Request body too large"})
 
-    mcp_method: Optional[str] = None
-    rpc_id = None
-    try:
-        payload = json.loads(body)
-        mcp_method = payload.get("method")
-        rpc_id = payload.get("id")
-    except Exception:
-        pass
+    mcp_method, rpc_id = _jsonrpc_method_and_id(body)
 
     # --- Request scanning ---
     det_kwargs: dict = {}
-    req_scan = await detector_scan(request_body_str, dest_config)
+    req_scan = await detector_scan_bytes(body, dest_config)
     if req_scan.action == "block":
         latency_ms = (time.monotonic() - start) * 1000
         log_request(
-            user=user, source_ip=source_ip, destination=destination,
             mcp_method=mcp_method, status_code=400, latency_ms=latency_ms,
-            rpc_id=rpc_id, request_body=request_body_str,
+            rpc_id=rpc_id, request_body=body,
             **_detection_log_kwargs(req_scan),
         )
         return _jsonrpc_error_response(-32600, "Request blocked by injection filter", rpc_id)
     if req_scan.action != "pass":
         det_kwargs = _detection_log_kwargs(req_scan)
-        request_body_str = req_scan.body
         body = req_scan.body.encode()
 
     sem = _get_streamable_http_semaphore(destination)
@@ -520,15 +651,12 @@ async def handle_streamable_http_post(
         except httpx.HTTPError as exc:
             latency_ms = (time.monotonic() - start) * 1000
             log_request(
-                user=user,
-                source_ip=source_ip,
-                destination=destination,
                 mcp_method=mcp_method,
                 status_code=502,
                 latency_ms=latency_ms,
                 error=str(exc),
                 rpc_id=rpc_id,
-                request_body=request_body_str,
+                request_body=body,
                 **det_kwargs,
             )
             return JSONResponse(
@@ -572,14 +700,11 @@ async def handle_streamable_http_post(
                     await client.aclose()
                     sem.release()
                     log_request(
-                        user=user,
-                        source_ip=source_ip,
-                        destination=destination,
                         mcp_method=mcp_method,
                         status_code=captured_status,
                         latency_ms=(time.monotonic() - start) * 1000,
                         rpc_id=rpc_id,
-                        request_body=request_body_str,
+                        request_body=body,
                         error=error_msg,
                         **det_kwargs,
                     )
@@ -597,23 +722,19 @@ async def handle_streamable_http_post(
         else:
             try:
                 response_body = await upstream.aread()
-                response_body_str = response_body.decode(errors="replace")
-                try:
-                    resp_payload = json.loads(response_body_str)
-                    if rpc_id is None:
-                        rpc_id = resp_payload.get("id")
-                except Exception:
-                    pass
+                if rpc_id is None:
+                    _, rpc_id = _jsonrpc_method_and_id(response_body)
 
                 # --- Response scanning ---
-                resp_scan = await detector_scan(response_body_str, dest_config, is_response=True)
+                resp_scan = await detector_scan_bytes(
+                    response_body, dest_config, is_response=True,
+                )
                 if resp_scan.action == "block":
                     latency_ms = (time.monotonic() - start) * 1000
                     log_request(
-                        user=user, source_ip=source_ip, destination=destination,
                         mcp_method=mcp_method, status_code=status_code,
                         latency_ms=latency_ms, rpc_id=rpc_id,
-                        request_body=request_body_str,
+                        request_body=body,
                         **_detection_log_kwargs(resp_scan),
                     )
                     return _jsonrpc_error_response(
@@ -621,20 +742,16 @@ async def handle_streamable_http_post(
                     )
                 if resp_scan.action != "pass":
                     det_kwargs.update(_detection_log_kwargs(resp_scan))
-                    response_body_str = resp_scan.body
                     response_body = resp_scan.body.encode()
 
                 latency_ms = (time.monotonic() - start) * 1000
                 log_request(
-                    user=user,
-                    source_ip=source_ip,
-                    destination=destination,
                     mcp_method=mcp_method,
                     status_code=status_code,
                     latency_ms=latency_ms,
                     rpc_id=rpc_id,
-                    request_body=request_body_str,
-                    response_body=response_body_str,
+                    request_body=body,
+                    response_body=response_body,
                     **det_kwargs,
                 )
                 return Response(
@@ -645,15 +762,12 @@ async def handle_streamable_http_post(
             except Exception as exc:
                 latency_ms = (time.monotonic() - start) * 1000
                 log_request(
-                    user=user,
-                    source_ip=source_ip,
-                    destination=destination,
                     mcp_method=mcp_method,
                     status_code=status_code,
                     latency_ms=latency_ms,
                     error=str(exc),
                     rpc_id=rpc_id,
-                    request_body=request_body_str,
+                    request_body=body,
                     **det_kwargs,
                 )
                 return JSONResponse(
@@ -701,8 +815,6 @@ async def handle_streamable_http_delete(
     if dest_config.type == "streamable_http":
         upstream_url = dest_config.url
         headers = _upstream_headers(request)
-        user = _user_from_request(request)
-        source_ip = _source_ip(request)
         start = time.monotonic()
         status_code = 502
         try:
@@ -717,9 +829,6 @@ async def handle_streamable_http_delete(
                 }
         except httpx.HTTPError as exc:
             log_request(
-                user=user,
-                source_ip=source_ip,
-                destination=destination,
                 mcp_method=None,
                 status_code=502,
                 latency_ms=(time.monotonic() - start) * 1000,
@@ -730,9 +839,6 @@ async def handle_streamable_http_delete(
                 content={"error": "Upstream unreachable"},
             )
         log_request(
-            user=user,
-            source_ip=source_ip,
-            destination=destination,
             mcp_method=None,
             status_code=status_code,
             latency_ms=(time.monotonic() - start) * 1000,
@@ -774,8 +880,6 @@ async def handle_streamable_http_get(
 
     upstream_url = dest_config.url
     headers = _upstream_headers(request)
-    user = _user_from_request(request)
-    source_ip = _source_ip(request)
     start = time.monotonic()
 
     sem = _get_streamable_http_semaphore(destination)
@@ -793,9 +897,6 @@ async def handle_streamable_http_get(
         except httpx.HTTPError as exc:
             latency_ms = (time.monotonic() - start) * 1000
             log_request(
-                user=user,
-                source_ip=source_ip,
-                destination=destination,
                 mcp_method=None,
                 status_code=502,
                 latency_ms=latency_ms,
@@ -819,9 +920,6 @@ async def handle_streamable_http_get(
                 await client.aclose()
                 sem.release()
             log_request(
-                user=user,
-                source_ip=source_ip,
-                destination=destination,
                 mcp_method=None,
                 status_code=status_code,
                 latency_ms=(time.monotonic() - start) * 1000,
@@ -853,9 +951,6 @@ async def handle_streamable_http_get(
                 await client.aclose()
                 sem.release()
                 log_request(
-                    user=user,
-                    source_ip=source_ip,
-                    destination=destination,
                     mcp_method=None,
                     status_code=status_code,
                     latency_ms=(time.monotonic() - start) * 1000,
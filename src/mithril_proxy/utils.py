@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import os
+import re
+from typing import TYPE_CHECKING, Optional
 
 from fastapi import Request
 
@@ -10,6 +12,40 @@ if TYPE_CHECKING:
     from .detector import DetectionResult
 
 
+# Cap on buffered POST bodies; 0 disables the cap.
+_MAX_REQUEST_BODY_BYTES = int(os.environ.get("MAX_REQUEST_BODY_BYTES", "0"))
+
+# Leading JSON whitespace; matched (not stripped) to avoid copying large bodies.
+_JSON_LEADING_WS_RE = re.compile(rb"[ \t\r\n]*")
+
+
+def json_first_byte(body: bytes) -> bytes:
+    """Return the first non-whitespace byte of *body* (``b""`` if none)."""
+    start = _JSON_LEADING_WS_RE.match(body).end()
+    return body[start:start + 1]
+
+
+async def read_body(request: Request) -> Optional[bytes]:
+    """Buffer the request body, or return None if it exceeds the size cap.
+
+    Reads via ``request.stream()`` so an oversized body is abandoned as soon
+    as it crosses ``MAX_REQUEST_BODY_BYTES`` rather than after it has been
+    held in memory in full.  Without a cap this is ``request.body()``.
+    """
+    limit = _MAX_REQUEST_BODY_BYTES
+    if limit <= 0:
+        return await request.body()
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        return None
+    buf = bytearray()
+    async for chunk in request.stream():
+        buf += chunk
+        if len(buf) > limit:
+            return None
+    return bytes(buf)
+
+
 def detection_log_kwargs(result: DetectionResult) -> dict[str, str]:
     """Build log_request kwargs from a DetectionResult (only when non-pass)."""
     if result.action == "pass":
@@ -21,6 +57,16 @@ def detection_log_kwargs(result: DetectionResult) -> dict[str, str]:
     }
 
 
+def user_from_request(request: Request) -> str:
+    """Return the first 8 chars of the Bearer token for log correlation."""
+    auth = request.headers.get("authorization", "")
+    # Lower-case only the 7-char scheme prefix, not the whole (often JWT) header.
+    if auth[:7].lower() != "bearer ":
+        return "anonymous"
+    token = auth[7:].strip()
+    return token[:8] if token else "anonymous"
+
+
 def source_ip(request: Request) -> str:
     """Return the client IP address from the request.
 
@@ -0,0 +1,29 @@
+"""Shared pytest configuration."""
+from __future__ import annotations
+
+import pytest
+import pytest_asyncio.plugin
+
+try:
+    import uvloop as _uvloop
+except ImportError:  # e.g. Windows, or installed without uvicorn[standard]
+    _uvloop = None
+
+# pytest-asyncio grew the loop-factory hook in the 1.x series; before that the
+# loop is chosen through an overridable ``event_loop_policy`` fixture.
+_HAS_LOOP_FACTORY_HOOK = hasattr(pytest_asyncio.plugin, "PytestAsyncioSpecs")
+
+
+if _uvloop is not None and _HAS_LOOP_FACTORY_HOOK:
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_asyncio_loop_factories(config, item):
+        """Run async tests on uvloop, the loop uvicorn picks in production."""
+        return {"uvloop": _uvloop.new_event_loop}
+
+elif _uvloop is not None:
+
+    @pytest.fixture(scope="session")
+    def event_loop_policy():
+        """Older pytest-asyncio: select uvloop through the loop policy instead."""
+        return _uvloop.EventLoopPolicy()
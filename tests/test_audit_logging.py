@@ -8,7 +8,6 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
@@ -21,9 +20,68 @@ _UUID_A = "00000000-0000-4000-8000-000000000001"
 # Helpers
 # --------------------------------------------------------------------------- #
 
-def _read_log_lines(path: Path) -> list[dict]:
-    lines = [ln.strip() for ln in path.read_text().splitlines() if ln.strip()]
-    return [json.loads(ln) for ln in lines]
+class _MemoryLog(logging.Handler):
+    """Keep formatted log lines in memory so tests skip the file round trip."""
+
+    def __init__(self) -> None:
+        import mithril_proxy.logger as log_mod
+
+        super().__init__()
+        self.setFormatter(log_mod._JsonFormatter())
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+def _read_log_lines(log: _MemoryLog) -> list[dict]:
+    """Parse each line captured by *log* as JSON."""
+    return [json.loads(line) for line in log.lines]
+
+
+class _FakeUpstreamResponse:
+    """Stand-in for the ``httpx.Response`` returned by _connect_with_retries.
+
+    handle_message() reads only these three attributes; a slotted class is
+    far cheaper to build than ``MagicMock(spec=httpx.Response)``.
+    """
+
+    __slots__ = ("status_code", "content", "headers")
+
+    def __init__(self, status_code: int, content: bytes, headers: dict[str, str]) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+
+class _FakeClient:
+    __slots__ = ("host",)
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+
+
+class _FakeRequest:
+    """The slice of ``Request`` the stdio POST handler reads."""
+
+    __slots__ = ("headers", "client", "_body")
+
+    def __init__(self, body: bytes = b"", client_ip: str = "127.0.0.1") -> None:
+        self.headers: dict[str, str] = {}
+        self.client = _FakeClient(client_ip)
+        self._body = body
+
+    async def body(self) -> bytes:
+        return self._body
+
+
+def _fed_stream_reader(*lines: bytes) -> asyncio.StreamReader:
+    """Return a StreamReader pre-loaded with *lines* and then EOF."""
+    reader = asyncio.StreamReader()
+    for line in lines:
+        reader.feed_data(line)
+    reader.feed_eof()
+    return reader
 
 
 # --------------------------------------------------------------------------- #
@@ -31,8 +89,9 @@ def _read_log_lines(path: Path) -> list[dict]:
 # --------------------------------------------------------------------------- #
 
 @pytest.fixture()
-def tmp_log(tmp_path):
-    return tmp_path / "audit.log"
+def tmp_log():
+    """In-memory stand-in for the audit log file; read with _read_log_lines."""
+    return _MemoryLog()
 
 
 @pytest.fixture()
@@ -40,11 +99,10 @@ def setup_logger(tmp_log):
     """Wire up a real JSON logger so log_request() writes to tmp_log."""
     import mithril_proxy.logger as log_mod
 
-    logger = logging.getLogger(f"mithril_proxy_audit_{id(tmp_log)}")
+    # Fixed name: per-test names would accumulate in loggerDict for the session.
+    logger = logging.getLogger("mithril_proxy_audit_test")
     logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
-    handler.setFormatter(log_mod._JsonFormatter())
-    logger.addHandler(handler)
+    logger.addHandler(tmp_log)
     logger.setLevel(logging.DEBUG)
     logger.propagate = False
 
@@ -52,55 +110,81 @@ def setup_logger(tmp_log):
     log_mod._logger = logger
     yield logger
     log_mod._logger = original
-    handler.close()
+    logger.handlers.clear()
+    logging.Logger.manager.loggerDict.pop(logger.name, None)
 
 
 @pytest.fixture(autouse=True)
-def reset_bridge_state():
-    """Prevent _stdio_bridges leaking between tests."""
+def reset_audit_flags():
+    """Re-read AUDIT_LOG_BODIES after each test so a patched env can't leak."""
+    import mithril_proxy.logger as log_mod
+    yield
+    log_mod.reload_flags()
+
+
+def _kill_all_bridges() -> None:
+    """Terminate live bridge subprocesses and reset the bridge registry."""
     import mithril_proxy.bridge as bridge
-    for b in list(bridge._stdio_bridges.values()):
-        if b.process and b.process.returncode is None:
-            try:
-                b.process.terminate()
-            except ProcessLookupError:
-                pass
+    procs = [
+        b.process for b in bridge._stdio_bridges.values()
+        if b.process and b.process.returncode is None
+    ]
+    for proc in procs:
+        try:
+            proc.terminate()
+        except ProcessLookupError:
+            pass
     bridge._stdio_bridges.clear()
     bridge._bridges_create_lock = None
+
+
+@pytest.fixture(autouse=True)
+def reset_bridge_state():
+    """Prevent _stdio_bridges leaking between tests.
+
+    Synchronous on purpose: each async test has its own event loop, so the
+    processes can't be awaited here — terminating them is enough.
+    """
+    _kill_all_bridges()
     yield
-    for b in list(bridge._stdio_bridges.values()):
-        if b.process and b.process.returncode is None:
-            try:
-                b.process.terminate()
-            except ProcessLookupError:
-                pass
-    bridge._stdio_bridges.clear()
-    bridge._bridges_create_lock = None
+    _kill_all_bridges()
 
 
-@pytest.fixture()
-def app(tmp_log, tmp_path):
-    """FastAPI app with one SSE destination wired to tmp_log."""
-    destinations_yml = tmp_path / "destinations.yml"
+@pytest.fixture(scope="module")
+def _audit_app(tmp_path_factory):
+    """Load the one-SSE-destination config and import the app once per module.
+
+    Module (not session) scope: the destination registry is process-global
+    and other test modules load their own configs.
+    """
+    destinations_yml = tmp_path_factory.mktemp("audit_config") / "destinations.yml"
     destinations_yml.write_text(
         "destinations:\n  testdest:\n    url: http://upstream.example.com\n"
     )
 
     import mithril_proxy.config as cfg
-    import mithril_proxy.logger as log_mod
 
     cfg.load_config(path=destinations_yml)
 
+    from mithril_proxy.main import app as fastapi_app
+    return fastapi_app
+
+
+@pytest.fixture()
+def app(_audit_app, tmp_log):
+    """The shared FastAPI app with its logger writing to this test's tmp_log."""
+    import mithril_proxy.logger as log_mod
+
     logger = logging.getLogger("mithril_proxy")
     logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
-    handler.setFormatter(log_mod._JsonFormatter())
-    logger.addHandler(handler)
+    logger.addHandler(tmp_log)
     logger.setLevel(logging.INFO)
     log_mod._logger = logger
 
-    from mithril_proxy.main import app as fastapi_app
-    return fastapi_app
+    yield _audit_app
+    # "mithril_proxy" is shared with module-level _log references, so only
+    # its handlers are dropped — the logger itself stays registered.
+    logger.handlers.clear()
 
 
 # --------------------------------------------------------------------------- #
@@ -240,6 +324,44 @@ class TestTruncation:
         assert "truncated" not in entry
         assert len(entry["request_body"]) == 32_768
 
+    def test_multibyte_body_truncated_by_bytes_on_char_boundary(self, setup_logger, tmp_log):
+        import mithril_proxy.logger as log_mod
+
+        # 1 + 2 * 20_000 bytes; the 32 KB cut lands inside an "é".
+        body = "x" + "\u00e9" * 20_000
+        log_mod.log_request(
+            user="anon",
+            source_ip="127.0.0.1",
+            destination="testdest",
+            mcp_method=None,
+            status_code=200,
+            latency_ms=1.0,
+            request_body=body,
+        )
+        entry = _read_log_lines(tmp_log)[0]
+        assert entry.get("truncated") is True
+        assert entry["request_body"] == body[:16_384]
+        assert len(entry["request_body"].encode("utf-8")) == 32_767
+
+    def test_bytes_bodies_are_decoded_and_truncated(self, setup_logger, tmp_log):
+        import mithril_proxy.logger as log_mod
+
+        large = ("x" + "\u00e9" * 20_000).encode("utf-8")
+        log_mod.log_request(
+            user="anon",
+            source_ip="127.0.0.1",
+            destination="testdest",
+            mcp_method=None,
+            status_code=200,
+            latency_ms=1.0,
+            request_body=b'{"jsonrpc":"2.0"}',
+            response_body=large,
+        )
+        entry = _read_log_lines(tmp_log)[0]
+        assert entry["request_body"] == '{"jsonrpc":"2.0"}'
+        assert entry.get("truncated") is True
+        assert entry["response_body"] == large.decode("utf-8")[:16_384]
+
 
 # --------------------------------------------------------------------------- #
 # TestAuditToggle
@@ -250,6 +372,7 @@ class TestAuditToggle:
         import mithril_proxy.logger as log_mod
 
         with patch.dict("os.environ", {"AUDIT_LOG_BODIES": "false"}):
+            log_mod.reload_flags()
             log_mod.log_request(
                 user="anon",
                 source_ip="127.0.0.1",
@@ -272,6 +395,7 @@ class TestAuditToggle:
         import mithril_proxy.logger as log_mod
 
         with patch.dict("os.environ", {"AUDIT_LOG_BODIES": "0"}):
+            log_mod.reload_flags()
             log_mod.log_request(
                 user="anon",
                 source_ip="127.0.0.1",
@@ -284,12 +408,32 @@ class TestAuditToggle:
         lines = _read_log_lines(tmp_log)
         assert "request_body" not in lines[0]
 
+    def test_sighup_reload_picks_up_flag_change(self, setup_logger, tmp_log):
+        import mithril_proxy.logger as log_mod
+        import mithril_proxy.main as main_mod
+
+        with patch.dict("os.environ", {"AUDIT_LOG_BODIES": "false"}), \
+                patch.object(main_mod, "reload_patterns") as mock_reload_patterns:
+            main_mod._reload_on_sighup()
+            log_mod.log_request(
+                user="anon",
+                source_ip="127.0.0.1",
+                destination="testdest",
+                mcp_method=None,
+                status_code=200,
+                latency_ms=1.0,
+                request_body="some body",
+            )
+        mock_reload_patterns.assert_called_once_with()
+        assert "request_body" not in _read_log_lines(tmp_log)[0]
+
     def test_audit_enabled_by_default(self, setup_logger, tmp_log):
         import mithril_proxy.logger as log_mod
 
         # Ensure no override is set
         env = {k: v for k, v in __import__("os").environ.items() if k != "AUDIT_LOG_BODIES"}
         with patch.dict("os.environ", env, clear=True):
+            log_mod.reload_flags()
             log_mod.log_request(
                 user="anon",
                 source_ip="127.0.0.1",
@@ -315,10 +459,7 @@ class TestSseProxyAuditLogging:
         session_id = "sess-audit-1"
         await proxy._register_session(session_id, "http://upstream.example.com/msg?sessionId=1")
 
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.status_code = 202
-        mock_response.content = b'{"accepted":true}'
-        mock_response.headers = {"content-type": "application/json"}
+        mock_response = _FakeUpstreamResponse(202, b'{"accepted":true}', {"content-type": "application/json"})
 
         with patch("mithril_proxy.proxy._connect_with_retries", new_callable=AsyncMock) as mock_conn:
             mock_conn.return_value = mock_response
@@ -347,10 +488,7 @@ class TestSseProxyAuditLogging:
         await proxy._register_session(session_id, "http://upstream.example.com/msg?sessionId=2")
 
         upstream_content = b'{"jsonrpc":"2.0","result":{"tools":[]},"id":7}'
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.status_code = 200
-        mock_response.content = upstream_content
-        mock_response.headers = {"content-type": "application/json"}
+        mock_response = _FakeUpstreamResponse(200, upstream_content, {"content-type": "application/json"})
 
         with patch("mithril_proxy.proxy._connect_with_retries", new_callable=AsyncMock) as mock_conn:
             mock_conn.return_value = mock_response
@@ -377,10 +515,7 @@ class TestSseProxyAuditLogging:
         session_id = "sess-audit-3"
         await proxy._register_session(session_id, "http://upstream.example.com/msg?sessionId=3")
 
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.status_code = 202
-        mock_response.content = b""
-        mock_response.headers = {}
+        mock_response = _FakeUpstreamResponse(202, b"", {})
 
         with patch("mithril_proxy.proxy._connect_with_retries", new_callable=AsyncMock) as mock_conn:
             mock_conn.return_value = mock_response
@@ -406,10 +541,7 @@ class TestSseProxyAuditLogging:
         session_id = "sess-audit-4"
         await proxy._register_session(session_id, "http://upstream.example.com/msg?sessionId=4")
 
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.status_code = 202
-        mock_response.content = b""
-        mock_response.headers = {}
+        mock_response = _FakeUpstreamResponse(202, b"", {})
 
         with patch("mithril_proxy.proxy._connect_with_retries", new_callable=AsyncMock) as mock_conn:
             mock_conn.return_value = mock_response
@@ -439,25 +571,15 @@ class TestSseProxyAuditLogging:
 
 class TestStdioAuditLogging:
     @pytest.mark.asyncio
-    async def test_post_handler_logs_request_body(self, setup_logger, tmp_log, tmp_path):
+    async def test_post_handler_logs_request_body(self, setup_logger, tmp_log):
         """handle_stdio_streamable_http_post() must log request_body."""
         from mithril_proxy.bridge import handle_stdio_streamable_http_post
         from mithril_proxy.config import DestinationConfig
 
-        echo_script = tmp_path / "echo_audit.py"
-        echo_script.write_text(
-            "import sys\n"
-            "for line in sys.stdin:\n"
-            "    print(line.rstrip(), flush=True)\n"
-        )
-        dest_config = DestinationConfig(type="stdio", command=f"python3 {echo_script}")
+        # cat echoes each request line back, which resolves it as its own response
+        dest_config = DestinationConfig(type="stdio", command="cat")
 
-        request = MagicMock()
-        body = b'{"jsonrpc":"2.0","method":"tools/call","id":5}'
-        request.body = AsyncMock(return_value=body)
-        request.headers = {}
-        request.client = MagicMock()
-        request.client.host = "127.0.0.1"
+        request = _FakeRequest(b'{"jsonrpc":"2.0","method":"tools/call","id":5}')
 
         resp = await handle_stdio_streamable_http_post(request, "testdest", dest_config, {})
         assert resp.status_code == 200
@@ -483,18 +605,10 @@ class TestStdioAuditLogging:
         future = loop.create_future()
         bridge.pending[0] = (future, 3)  # internal_id=0, original_id=3
 
-        line_bytes = b'{"jsonrpc":"2.0","result":{"content":"ok"},"id":0}\n'
-        responses = [line_bytes, b""]
-        call_count = 0
-
-        async def mock_readline():
-            nonlocal call_count
-            data = responses[min(call_count, len(responses) - 1)]
-            call_count += 1
-            return data
-
         mock_process = MagicMock()
-        mock_process.stdout.readline = mock_readline
+        mock_process.stdout = _fed_stream_reader(
+            b'{"jsonrpc":"2.0","result":{"content":"ok"},"id":0}\n',
+        )
         mock_process.wait = AsyncMock(return_value=0)
         mock_process.returncode = None
         bridge.process = mock_process
@@ -509,6 +623,9 @@ class TestStdioAuditLogging:
         entry = response_entries[0]
         assert "content" in entry["response_body"]
         assert entry.get("rpc_id") == 3
+        assert entry["user"] == "stdio"
+        assert entry["source_ip"] == "localhost"
+        assert entry["destination"] == "testdest"
 
     @pytest.mark.asyncio
     async def test_stdout_reader_separate_entry_per_line(self, setup_logger, tmp_log):
@@ -525,21 +642,11 @@ class TestStdioAuditLogging:
         bridge.pending[0] = (f1, 1)  # internal_id=0, original_id=1
         bridge.pending[1] = (f2, 2)  # internal_id=1, original_id=2
 
-        lines_to_emit = [
+        mock_process = MagicMock()
+        mock_process.stdout = _fed_stream_reader(
             b'{"jsonrpc":"2.0","result":{},"id":0}\n',
             b'{"jsonrpc":"2.0","result":{},"id":1}\n',
-            b"",
-        ]
-        call_count = 0
-
-        async def mock_readline():
-            nonlocal call_count
-            data = lines_to_emit[min(call_count, len(lines_to_emit) - 1)]
-            call_count += 1
-            return data
-
-        mock_process = MagicMock()
-        mock_process.stdout.readline = mock_readline
+        )
         mock_process.wait = AsyncMock(return_value=0)
         mock_process.returncode = None
         bridge.process = mock_process
@@ -563,17 +670,8 @@ class TestStdioAuditLogging:
         bridge = StdioDestinationBridge(destination="testdest")
         _stdio_bridges["testdest"] = bridge
 
-        responses = [b"plain text output\n", b""]
-        call_count = 0
-
-        async def mock_readline():
-            nonlocal call_count
-            data = responses[min(call_count, len(responses) - 1)]
-            call_count += 1
-            return data
-
         mock_process = MagicMock()
-        mock_process.stdout.readline = mock_readline
+        mock_process.stdout = _fed_stream_reader(b"plain text output\n")
         mock_process.wait = AsyncMock(return_value=0)
         mock_process.returncode = None
         bridge.process = mock_process
@@ -587,28 +685,27 @@ class TestStdioAuditLogging:
         assert not response_entries, "Malformed JSON must not produce a response_body log entry"
 
     @pytest.mark.asyncio
-    async def test_stdio_audit_disabled_omits_bodies(self, setup_logger, tmp_log, tmp_path):
+    async def test_stdio_audit_disabled_omits_bodies(self, setup_logger, tmp_log):
         """With AUDIT_LOG_BODIES=false, POST log entries omit request_body and response_body."""
         from mithril_proxy.bridge import handle_stdio_streamable_http_post
         from mithril_proxy.config import DestinationConfig
 
-        echo_script = tmp_path / "echo_audit2.py"
-        echo_script.write_text(
-            "import sys\n"
-            "for line in sys.stdin:\n"
-            "    print(line.rstrip(), flush=True)\n"
-        )
-        dest_config = DestinationConfig(type="stdio", command=f"python3 {echo_script}")
+        dest_config = DestinationConfig(type="stdio", command="cat")
 
-        request = MagicMock()
-        body = b'{"jsonrpc":"2.0","method":"tools/list","id":1}'
-        request.body = AsyncMock(return_value=body)
-        request.headers = {}
-        request.client = MagicMock()
-        request.client.host = "127.0.0.1"
+        request = _FakeRequest(b'{"jsonrpc":"2.0","method":"tools/list","id":1}')
 
-        with patch.dict("os.environ", {"AUDIT_LOG_BODIES": "false"}):
-            resp = await handle_stdio_streamable_http_post(request, "testdest", dest_config, {})
+        import mithril_proxy.logger as log_mod
+
+        # The app middleware binds the identity fields; stand in for it here.
+        token = log_mod.set_request_context(
+            user="stdio", source_ip="127.0.0.1", destination="testdest",
+        )
+        try:
+            with patch.dict("os.environ", {"AUDIT_LOG_BODIES": "false"}):
+                log_mod.reload_flags()
+                resp = await handle_stdio_streamable_http_post(request, "testdest", dest_config, {})
+        finally:
+            log_mod.reset_request_context(token)
         assert resp.status_code == 200
 
         log_lines = _read_log_lines(tmp_log)
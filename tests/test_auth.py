@@ -7,7 +7,6 @@ from __future__ import annotations
 
 import json
 import logging
-from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
@@ -16,16 +15,33 @@ import pytest
 # Helpers
 # --------------------------------------------------------------------------- #
 
+class _FakeClient:
+    __slots__ = ("host",)
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+
+
+class _FakeRequest:
+    """The slice of ``Request`` the helpers under test read.
+
+    A plain slotted object rather than a mock, so a typo'd attribute raises
+    instead of silently returning a child mock.
+    """
+
+    __slots__ = ("headers", "client", "query_params")
+
+    def __init__(self, headers: dict[str, str], client_ip: str = "127.0.0.1") -> None:
+        self.headers = headers
+        self.client = _FakeClient(client_ip)
+        self.query_params: dict[str, str] = {}
+
+
 def _make_request(auth_header: str | None = None, client_ip: str = "127.0.0.1"):
-    req = MagicMock()
     headers = {}
     if auth_header is not None:
         headers["authorization"] = auth_header
-    req.headers = headers
-    req.client = MagicMock()
-    req.client.host = client_ip
-    req.query_params = {}
-    return req
+    return _FakeRequest(headers, client_ip)
 
 
 # --------------------------------------------------------------------------- #
@@ -34,46 +50,45 @@ def _make_request(auth_header: str | None = None, client_ip: str = "127.0.0.1"):
 
 class TestUserCorrelation:
     def test_valid_token_uses_first_8_chars(self):
-        from mithril_proxy.proxy import _user_from_request
+        from mithril_proxy.utils import user_from_request
 
         req = _make_request("Bearer abcdefghijklmno")
-        assert _user_from_request(req) == "abcdefgh"
+        assert user_from_request(req) == "abcdefgh"
 
     def test_missing_auth_returns_anonymous(self):
-        from mithril_proxy.proxy import _user_from_request
+        from mithril_proxy.utils import user_from_request
 
         req = _make_request(None)
-        assert _user_from_request(req) == "anonymous"
+        assert user_from_request(req) == "anonymous"
 
     def test_malformed_auth_returns_anonymous(self):
-        from mithril_proxy.proxy import _user_from_request
+        from mithril_proxy.utils import user_from_request
 
         req = _make_request("Basic dXNlcjpwYXNz")
-        assert _user_from_request(req) == "anonymous"
+        assert user_from_request(req) == "anonymous"
 
     def test_bearer_prefix_case_insensitive(self):
-        from mithril_proxy.proxy import _user_from_request
+        from mithril_proxy.utils import user_from_request
 
         req = _make_request("BEARER mytoken123")
-        assert _user_from_request(req) == "mytoken1"
+        assert user_from_request(req) == "mytoken1"
 
     def test_short_token_uses_full_token(self):
-        from mithril_proxy.proxy import _user_from_request
+        from mithril_proxy.utils import user_from_request
 
         req = _make_request("Bearer abc")
-        assert _user_from_request(req) == "abc"
+        assert user_from_request(req) == "abc"
 
 
 class TestHeaderPassthrough:
     def test_auth_header_included_in_upstream_headers(self):
         from mithril_proxy.proxy import _upstream_headers
 
-        req = MagicMock()
-        req.headers = {
+        req = _FakeRequest({
             "authorization": "Bearer mysecrettoken",
             "content-type": "application/json",
             "host": "localhost:3000",
-        }
+        })
         result = _upstream_headers(req)
 
         assert "authorization" in result
@@ -84,8 +99,7 @@ class TestHeaderPassthrough:
     def test_host_header_is_stripped(self):
         from mithril_proxy.proxy import _upstream_headers
 
-        req = MagicMock()
-        req.headers = {"host": "example.com", "x-custom": "value"}
+        req = _FakeRequest({"host": "example.com", "x-custom": "value"})
         result = _upstream_headers(req)
         assert "host" not in result
         assert result["x-custom"] == "value"
@@ -93,7 +107,6 @@ class TestHeaderPassthrough:
     def test_no_auth_header_not_injected(self):
         from mithril_proxy.proxy import _upstream_headers
 
-        req = MagicMock()
-        req.headers = {"content-type": "application/json"}
+        req = _FakeRequest({"content-type": "application/json"})
         result = _upstream_headers(req)
         assert "authorization" not in result
@@ -3,14 +3,79 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import logging.handlers
 
 import httpx
 import pytest
 
+import mithril_proxy.bridge as bridge_mod
+import mithril_proxy.config as cfg
+import mithril_proxy.logger as log_mod
+from mithril_proxy.bridge import (
+    StdioDestinationBridge,
+    _spawn_process,
+    _stdio_bridges,
+    _stdio_stdout_reader,
+    shutdown_all_stdio,
+    validate_stdio_commands,
+)
+from mithril_proxy.config import DestinationConfig
+
 # Valid UUID4-format strings used across tests (must match _UUID4_RE in bridge.py)
 _UUID_A = "00000000-0000-4000-8000-000000000001"
 _UUID_B = "00000000-0000-4000-8000-000000000002"
 
+# --------------------------------------------------------------------------- #
+# Helpers
+# --------------------------------------------------------------------------- #
+
+class _FakeProcess:
+    """In-memory stand-in for asyncio.subprocess.Process in shutdown tests.
+
+    ``wait()`` resolves once the process has been signalled; with
+    *ignores_sigterm* only ``kill()`` ends it, as with a hung server.
+    """
+
+    def __init__(self, *, ignores_sigterm: bool = False) -> None:
+        self.returncode: int | None = None
+        self.signals: list[str] = []
+        self._ignores_sigterm = ignores_sigterm
+        self._exited = asyncio.Event()
+
+    def terminate(self) -> None:
+        self.signals.append("SIGTERM")
+        if not self._ignores_sigterm:
+            self._exit(-15)
+
+    def kill(self) -> None:
+        self.signals.append("SIGKILL")
+        self._exit(-9)
+
+    def _exit(self, code: int) -> None:
+        self.returncode = code
+        self._exited.set()
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        return self.returncode
+
+
+class _ExitedProcess:
+    """Stand-in for a subprocess that exited immediately with no output."""
+
+    pid = 0
+    returncode = 0
+
+    def __init__(self) -> None:
+        self.stdout = asyncio.StreamReader()
+        self.stdout.feed_eof()
+        self.stderr = asyncio.StreamReader()
+        self.stderr.feed_eof()
+
+    async def wait(self) -> int:
+        return self.returncode
+
+
 # --------------------------------------------------------------------------- #
 # Fixtures
 # --------------------------------------------------------------------------- #
@@ -18,12 +83,11 @@ _UUID_B = "00000000-0000-4000-8000-000000000002"
 @pytest.fixture(autouse=True)
 def reset_bridge_state():
     """Clear module-level bridge state between tests to prevent leakage."""
-    import mithril_proxy.bridge as bridge
-    bridge._stdio_bridges.clear()
-    bridge._bridges_create_lock = None
+    bridge_mod._stdio_bridges.clear()
+    bridge_mod._bridges_create_lock = None
     yield
-    bridge._stdio_bridges.clear()
-    bridge._bridges_create_lock = None
+    bridge_mod._stdio_bridges.clear()
+    bridge_mod._bridges_create_lock = None
 
 
 @pytest.fixture()
@@ -34,54 +98,67 @@ def tmp_log(tmp_path):
 @pytest.fixture()
 def setup_logger(tmp_log):
     """Wire up a real logger so bridge code can call get_logger()."""
-    import mithril_proxy.logger as log_mod
-
     logger = logging.getLogger("mithril_proxy_test_bridge")
     logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
+    handler = logging.FileHandler(str(tmp_log), mode="a", delay=True)
     handler.setFormatter(log_mod._JsonFormatter())
-    logger.addHandler(handler)
+    # Buffer records so retry/stderr-heavy tests don't pay a write() per line;
+    # nothing here reads tmp_log mid-test, close() flushes at teardown.
+    mem = logging.handlers.MemoryHandler(
+        capacity=1024, flushLevel=logging.CRITICAL, target=handler
+    )
+    logger.addHandler(mem)
     logger.setLevel(logging.DEBUG)
     log_mod._logger = logger
     yield logger
     log_mod._logger = None
+    mem.close()
+    handler.close()
+    logger.handlers.clear()
 
 
-@pytest.fixture()
-def app_with_stdio(tmp_log, tmp_path):
-    """FastAPI app with one stdio and one SSE destination."""
-    echo_script = tmp_path / "echo_server.py"
-    echo_script.write_text(
-        "import sys\n"
-        "for line in sys.stdin:\n"
-        "    print(line.rstrip(), flush=True)\n"
-    )
+@pytest.fixture(scope="module")
+def app_with_stdio(tmp_path_factory):
+    """FastAPI app with one stdio and one SSE destination.
 
+    Module-scoped: the config and logging wiring are identical for every
+    test; per-test bridge state is still reset by reset_bridge_state.
+    """
+    tmp_path = tmp_path_factory.mktemp("app_with_stdio")
     destinations_yml = tmp_path / "destinations.yml"
     destinations_yml.write_text(
         "destinations:\n"
         "  echostdio:\n"
         "    type: stdio\n"
-        f"    command: python3 {echo_script}\n"
+        "    command: cat\n"
         "  ssedest:\n"
         "    url: http://upstream.example.com\n"
     )
 
-    import mithril_proxy.config as cfg
-    import mithril_proxy.logger as log_mod
-
     cfg.load_config(path=destinations_yml)
 
     logger = logging.getLogger("mithril_proxy")
     logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
+    handler = logging.FileHandler(str(tmp_path / "bridge.log"), mode="a", delay=True)
     handler.setFormatter(log_mod._JsonFormatter())
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
     log_mod._logger = logger
 
     from mithril_proxy.main import app as fastapi_app
-    return fastapi_app
+    yield fastapi_app
+    # "mithril_proxy" is shared with module-level _log references, so only
+    # its handlers are dropped — the logger itself stays registered.
+    handler.close()
+    logger.handlers.clear()
+
+
+@pytest.fixture(scope="module")
+def stdio_client(app_with_stdio):
+    """TestClient for app_with_stdio, shared across the module."""
+    from fastapi.testclient import TestClient
+
+    return TestClient(app_with_stdio, raise_server_exceptions=False)
 
 
 # --------------------------------------------------------------------------- #
@@ -89,29 +166,78 @@ def app_with_stdio(tmp_log, tmp_path):
 # --------------------------------------------------------------------------- #
 
 class TestValidateStdioCommands:
-    def test_valid_python3_command_passes(self):
-        from mithril_proxy.bridge import validate_stdio_commands
-        from mithril_proxy.config import DestinationConfig
+    @pytest.mark.parametrize("configs,error", [
+        pytest.param(
+            {"myserver": DestinationConfig(type="stdio", command="python3 --version")},
+            None,
+            id="valid-python3-command",
+        ),
+        pytest.param(
+            {"bad": DestinationConfig(type="stdio", command="this-binary-definitely-does-not-exist --flag")},
+            "not found on PATH",
+            id="missing-executable",
+        ),
+        pytest.param(
+            {"mysse": DestinationConfig(type="sse", url="http://example.com")},
+            None,
+            id="sse-skipped",
+        ),
+    ])
+    def test_validate_stdio_commands(self, configs, error):
+        if error is None:
+            validate_stdio_commands(configs)  # must not raise
+        else:
+            with pytest.raises(ValueError, match=error):
+                validate_stdio_commands(configs)
 
-        configs = {"myserver": DestinationConfig(type="stdio", command="python3 --version")}
-        validate_stdio_commands(configs)  # must not raise
 
-    def test_missing_executable_raises(self):
-        from mithril_proxy.bridge import validate_stdio_commands
-        from mithril_proxy.config import DestinationConfig
+# --------------------------------------------------------------------------- #
+# TestSpawnProcess
+# --------------------------------------------------------------------------- #
+
+class TestSpawnProcess:
+    @pytest.mark.asyncio
+    async def test_stdout_line_longer_than_asyncio_default_limit(self):
+        """A 200 KB stdout line (> asyncio's 64 KiB default) reads as one line."""
+
+        proc = await _spawn_process("python3 -c \"print('x' * 200000)\"", {})
+        line = await proc.stdout.readline()
+        await proc.wait()
+        assert len(line) == 200_001
 
-        configs = {
-            "bad": DestinationConfig(type="stdio", command="this-binary-definitely-does-not-exist --flag")
-        }
-        with pytest.raises(ValueError, match="not found on PATH"):
-            validate_stdio_commands(configs)
 
-    def test_sse_destinations_are_skipped(self):
-        from mithril_proxy.bridge import validate_stdio_commands
-        from mithril_proxy.config import DestinationConfig
+# --------------------------------------------------------------------------- #
+# TestSubprocessRetry
+# --------------------------------------------------------------------------- #
+
+class TestSubprocessRetry:
+    @pytest.mark.asyncio
+    async def test_exit_restarts_then_closes_bridge(self, setup_logger, monkeypatch):
+        """Each exit triggers a restart until retries run out, then the bridge closes."""
+
+        spawned: list[_ExitedProcess] = []
+
+        async def fake_spawn(command, extra_env):
+            proc = _ExitedProcess()
+            spawned.append(proc)
+            return proc
+
+        monkeypatch.setattr(bridge_mod, "_spawn_process", fake_spawn)
+        monkeypatch.setattr(bridge_mod, "_RETRY_DELAYS", [0, 0, 0])
+        bridge = StdioDestinationBridge(destination="testdest", process=_ExitedProcess())
+        bridge.sessions.add(_UUID_A)
+        stream: asyncio.Queue = asyncio.Queue()
+        bridge.notification_queues["stream"] = stream
+        _stdio_bridges["testdest"] = bridge
+
+        dest_config = DestinationConfig(type="stdio", command="cat")
+        await _stdio_stdout_reader(bridge, dest_config, {})
+        await bridge.stderr_task
 
-        configs = {"mysse": DestinationConfig(type="sse", url="http://example.com")}
-        validate_stdio_commands(configs)  # must not raise
+        assert len(spawned) == 3
+        assert stream.get_nowait() is None  # GET streams get the close sentinel
+        assert not bridge.sessions
+        assert "testdest" not in _stdio_bridges
 
 
 # --------------------------------------------------------------------------- #
@@ -122,64 +248,56 @@ class TestShutdown:
     @pytest.mark.asyncio
     async def test_shutdown_terminates_processes(self, setup_logger):
         """shutdown_all_stdio sends SIGTERM to all registered bridges."""
-        from mithril_proxy.bridge import StdioDestinationBridge, _stdio_bridges, shutdown_all_stdio
-
-        # Spawn a real long-running process
-        proc = await asyncio.create_subprocess_exec(
-            "python3", "-c", "import time; time.sleep(60)",
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        assert proc.returncode is None
 
+        proc = _FakeProcess()
         bridge = StdioDestinationBridge(destination="testdest", process=proc)
         _stdio_bridges["testdest"] = bridge
 
         await shutdown_all_stdio()
 
-        # Process should be dead
+        assert proc.signals == ["SIGTERM"]
         assert proc.returncode is not None
         assert "testdest" not in _stdio_bridges
 
+    @pytest.mark.asyncio
+    async def test_shutdown_kills_process_ignoring_sigterm(self, setup_logger, monkeypatch):
+        """A process still running after the grace period is SIGKILLed."""
+
+        monkeypatch.setattr(bridge_mod, "_SHUTDOWN_GRACE", 0.01)
+        proc = _FakeProcess(ignores_sigterm=True)
+        _stdio_bridges["testdest"] = StdioDestinationBridge(destination="testdest", process=proc)
+
+        await shutdown_all_stdio()
+
+        assert proc.signals == ["SIGTERM", "SIGKILL"]
+        assert "testdest" not in _stdio_bridges
+
 
 # --------------------------------------------------------------------------- #
 # TestSseDestinationUnchanged
 # --------------------------------------------------------------------------- #
 
 class TestSseDestinationUnchanged:
-    def test_sse_destination_still_returns_404_for_unknown(self, app_with_stdio):
+    def test_sse_destination_still_returns_404_for_unknown(self, stdio_client):
         """SSE-type destinations continue to return 404 for unknown destinations."""
-        from fastapi.testclient import TestClient
-
-        client = TestClient(app_with_stdio, raise_server_exceptions=False)
-        resp = client.get("/nonexistent/sse")
+        resp = stdio_client.get("/nonexistent/sse")
         assert resp.status_code == 404
         assert "nonexistent" in resp.json()["error"]
 
-    def test_sse_destination_message_missing_session_returns_400(self, app_with_stdio):
+    def test_sse_destination_message_missing_session_returns_400(self, stdio_client):
         """POST to SSE-type destination without session_id returns 400."""
-        from fastapi.testclient import TestClient
-
-        client = TestClient(app_with_stdio, raise_server_exceptions=False)
-        resp = client.post("/ssedest/message", json={"jsonrpc": "2.0", "method": "ping", "id": 1})
+        resp = stdio_client.post("/ssedest/message", json={"jsonrpc": "2.0", "method": "ping", "id": 1})
         assert resp.status_code == 400
 
-    def test_stdio_destination_get_sse_returns_410(self, app_with_stdio):
+    def test_stdio_destination_get_sse_returns_410(self, stdio_client):
         """GET /{stdio_dest}/sse returns 410 Gone."""
-        from fastapi.testclient import TestClient
-
-        client = TestClient(app_with_stdio, raise_server_exceptions=False)
-        resp = client.get("/echostdio/sse")
+        resp = stdio_client.get("/echostdio/sse")
         assert resp.status_code == 410
         assert "mcp" in resp.json()["error"].lower()
 
-    def test_stdio_destination_post_message_returns_410(self, app_with_stdio):
+    def test_stdio_destination_post_message_returns_410(self, stdio_client):
         """POST /{stdio_dest}/message returns 410 Gone."""
-        from fastapi.testclient import TestClient
-
-        client = TestClient(app_with_stdio, raise_server_exceptions=False)
-        resp = client.post(
+        resp = stdio_client.post(
             f"/echostdio/message?session_id={_UUID_A}",
             json={"jsonrpc": "2.0", "method": "ping", "id": 1},
         )
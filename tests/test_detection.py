@@ -40,8 +40,7 @@ def _dest(regex_mode="off", ai_mode="off", ai_threshold=None, ai_max_chars=4000)
 
 
 def _read_log_lines(path: Path) -> list[dict]:
-    lines = [ln.strip() for ln in path.read_text().splitlines() if ln.strip()]
-    return [json.loads(ln) for ln in lines]
+    return [json.loads(ln) for ln in path.read_bytes().split(b"\n") if ln.strip()]
 
 
 # --------------------------------------------------------------------------- #
@@ -59,10 +58,16 @@ def patterns_dir(tmp_path):
 def reset_detector_state():
     """Reset detector module state between tests."""
     import mithril_proxy.detector as det
-    det._patterns = []
+    det._patterns = ()
+    det._combined = None
+    det._hs_prefilter = None
+    det._candidates = det._specialize((), None, None)
     det._ai_pipeline = None
     yield
-    det._patterns = []
+    det._patterns = ()
+    det._combined = None
+    det._hs_prefilter = None
+    det._candidates = det._specialize((), None, None)
     det._ai_pipeline = None
 
 
@@ -76,7 +81,8 @@ def setup_logger(tmp_log):
     """Wire up a real JSON logger so log_request() writes to tmp_log."""
     import mithril_proxy.logger as log_mod
 
-    logger = logging.getLogger(f"mithril_proxy_detection_{id(tmp_log)}")
+    # Fixed name: per-test names would accumulate in loggerDict for the session.
+    logger = logging.getLogger("mithril_proxy_detection_test")
     logger.handlers.clear()
     handler = logging.FileHandler(str(tmp_log), mode="a")
     handler.setFormatter(log_mod._JsonFormatter())
@@ -89,6 +95,17 @@ def setup_logger(tmp_log):
     yield logger
     log_mod._logger = original
     handler.close()
+    logger.handlers.clear()
+    logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+
+@pytest.fixture(scope="module")
+def admin_client():
+    """One TestClient for the admin endpoint tests; lifespan is never entered."""
+    from starlette.testclient import TestClient
+    from mithril_proxy.main import app
+
+    return TestClient(app)
 
 
 # =========================================================================== #
@@ -117,6 +134,27 @@ class TestPatternLoader:
         assert count == 1
         assert "Invalid regex" in caplog.text
 
+    def test_undecodable_and_unicode_blank_lines_skipped(self, patterns_dir, caplog):
+        (patterns_dir / "mixed.txt").write_bytes(
+            b"bad\xff\n\xc2\xa0\n\xc2\xa0# note\nvalid_pattern\n"
+        )
+        with caplog.at_level(logging.WARNING, logger="mithril_proxy"):
+            count = load_patterns(patterns_dir)
+        assert count == 1
+        assert "Invalid UTF-8 in mixed.txt line 1" in caplog.text
+
+    def test_many_files_keep_name_order(self, patterns_dir, caplog):
+        import mithril_proxy.detector as det
+
+        for i in range(12):
+            (patterns_dir / f"{i:02d}.txt").write_text(f"rule_{i:02d}\n")
+        (patterns_dir / "05b.txt").mkdir()  # unreadable: a directory
+        with caplog.at_level(logging.WARNING, logger="mithril_proxy"):
+            count = load_patterns(patterns_dir)
+        assert count == 12
+        assert [p.pattern for p in det._patterns] == [f"rule_{i:02d}" for i in range(12)]
+        assert "Cannot read pattern file" in caplog.text
+
     def test_missing_directory_warns(self, tmp_path, caplog):
         missing = tmp_path / "nonexistent"
         with caplog.at_level(logging.WARNING, logger="mithril_proxy"):
@@ -133,6 +171,19 @@ class TestPatternLoader:
         count = load_patterns(patterns_dir)
         assert count == 2
 
+    def test_reload_reuses_unchanged_rules(self, patterns_dir):
+        import mithril_proxy.detector as det
+
+        (patterns_dir / "v1.txt").write_text("kept_rule\n")
+        load_patterns(patterns_dir)
+        kept = det._patterns[0]
+        (patterns_dir / "v1.txt").write_text("kept_rule\nnew_rule\n")
+        load_patterns(patterns_dir)
+        assert det._patterns[0] is kept
+        assert det._compile_rule.cache_info().hits >= 1
+        det.clear_pattern_cache()
+        assert det._compile_rule.cache_info().currsize == 0
+
     def test_conf_files_loaded(self, patterns_dir):
         (patterns_dir / "rules.conf").write_text("some_rule\n")
         count = load_patterns(patterns_dir)
@@ -192,6 +243,10 @@ class TestRegexEngine:
         load_patterns(patterns_dir)
         result = await scan("completely safe content", _dest(regex_mode="block"))
         assert result.action == "pass"
+        # Every pass shares one frozen instance.
+        assert result is await scan("", _dest(regex_mode="block"))
+        with pytest.raises(AttributeError):
+            result.body = "mutated"
 
     @pytest.mark.asyncio
     async def test_empty_body_passes(self, patterns_dir):
@@ -207,6 +262,221 @@ class TestRegexEngine:
         result = await scan("INJECTION ATTACK", _dest(regex_mode="monitor"))
         assert result.action == "monitor"
 
+    @pytest.mark.asyncio
+    async def test_scan_bytes_skips_decode_when_off(self, patterns_dir):
+        from mithril_proxy.detector import scan_bytes
+
+        (patterns_dir / "rules.txt").write_text("injection\n")
+        load_patterns(patterns_dir)
+        off = await scan_bytes(b"injection \xff", _dest())
+        assert off.action == "pass" and off.body == ""
+        hit = await scan_bytes(b"injection \xff", _dest(regex_mode="redact"))
+        assert hit.body == "**REDACTED** \ufffd"
+
+    @pytest.mark.asyncio
+    async def test_first_listed_pattern_reported(self, patterns_dir, monkeypatch):
+        """The combined prefilter must not change which pattern is reported."""
+        import mithril_proxy.detector as det
+
+        monkeypatch.setattr(det, "_ahocorasick", None)
+        (patterns_dir / "rules.txt").write_text("beta\nalpha\n")
+        load_patterns(patterns_dir)
+        assert det._combined is not None
+        result = await scan("alpha then beta", _dest(regex_mode="redact"))
+        assert result.detail == "beta"
+        assert result.body == "alpha then **REDACTED**"
+
+    @pytest.mark.asyncio
+    async def test_uncombinable_patterns_scanned_individually(self, patterns_dir):
+        import mithril_proxy.detector as det
+
+        (patterns_dir / "rules.txt").write_text("(ab)\\1\n(?s)x.y\n")
+        load_patterns(patterns_dir)
+        assert det._combined is None
+        result = await scan("x\ny", _dest(regex_mode="monitor"))
+        assert result.action == "monitor"
+        assert result.detail == "(?s)x.y"
+
+    @pytest.mark.parametrize("source, literal", [
+        ("ignore\\s+previous", "previous"),
+        ("system\\s*prompt", "system"),
+        ("(?:jailbreak)+ now", "jailbreak"),
+        ("secret_(data|key)", "secret_"),
+        ("foo|barbaz", ""),
+        ("x?y*", ""),
+    ])
+    def test_required_literal(self, source, literal):
+        from mithril_proxy.detector import _required_literal
+
+        assert _required_literal(source) == literal
+
+    @pytest.mark.asyncio
+    async def test_literal_prefilter_narrows_candidates(self, patterns_dir):
+        pytest.importorskip("ahocorasick")
+        import mithril_proxy.detector as det
+
+        (patterns_dir / "rules.txt").write_text("ignore\\s+previous\nsecret\n")
+        load_patterns(patterns_dir)
+        assert det._candidates("nothing to see here") == []
+        assert det._candidates("a SECRET") == [det._patterns[1]]
+        # U+017F matches "s" under re.IGNORECASE.
+        result = await scan("\u017fecret", _dest(regex_mode="block"))
+        assert result.action == "block"
+
+    @pytest.mark.asyncio
+    async def test_literal_prefilter_passes_dotted_capital_i(self, patterns_dir):
+        pytest.importorskip("ahocorasick")
+        import mithril_proxy.detector as det
+
+        (patterns_dir / "rules.txt").write_text("injection\n\u0130gnore\n")
+        load_patterns(patterns_dir)
+        # "\u0130".casefold() is "i\u0307", yet re.IGNORECASE pairs U+0130 with "i".
+        result = await scan("\u0130NJECT\u0130ON here", _dest(regex_mode="block"))
+        assert result.action == "block"
+        assert det._candidates("IGNORE this") == [det._patterns[1]]
+
+    @pytest.mark.parametrize("source, lowered", [
+        ("IGNORE\\s+Previous", "ignore\\s+previous"),
+        ("[A-Z]+_key", "[a-z]+_key"),
+        ("[^A-F]x", "[^a-f]x"),
+        ("\\S+", None),
+        ("\\x41b", None),
+        ("[A-z]", None),
+        ("(?-i:ABC)", None),
+        ("café", None),
+        # ASCII escapes for characters IGNORECASE folds onto ASCII letters.
+        ("\\u0130njection", None),
+        ("\\u017fecret", None),
+        ("[\\u017f]ecret", None),
+        ("\\u212aey", None),
+        ("(a)|b(?=c)(?(1)x|y)(?>Z)", "(a)|b(?=c)(?(1)x|y)(?>z)"),
+    ])
+    def test_ascii_lowered_rule(self, source, lowered):
+        from mithril_proxy.detector import _ascii_lowered_rule
+
+        rule = _ascii_lowered_rule(source)
+        assert (rule.pattern if rule else None) == lowered
+
+    @pytest.mark.parametrize("source, body", [
+        ("\\u0130njection", "injection"),
+        ("\\u017fecret", "SECRET"),
+        ("[\\u017f]ecret", "secret"),
+        ("\\u212aey", "key"),
+    ])
+    @pytest.mark.asyncio
+    async def test_escaped_fold_to_ascii_rules_still_block(self, patterns_dir, monkeypatch, source, body):
+        import mithril_proxy.detector as det
+
+        monkeypatch.setattr(det, "_ahocorasick", None)
+        (patterns_dir / "rules.txt").write_text(source + "\n")
+        load_patterns(patterns_dir)
+        assert (await scan(body, _dest(regex_mode="block"))).action == "block"
+
+    @pytest.mark.asyncio
+    async def test_lowered_redaction_keeps_original_case(self, patterns_dir):
+        (patterns_dir / "rules.txt").write_text("Secret_[A-Z]+\n")
+        load_patterns(patterns_dir)
+        result = await scan("A secret_KEY and SECRET_pw Here", _dest(regex_mode="redact"))
+        r = _REDACTION_PLACEHOLDER
+        assert result.body == f"A {r} and {r} Here"
+        # Non-ASCII bodies search with the IGNORECASE rule itself.
+        result = await scan("É SECRET_X", _dest(regex_mode="redact"))
+        assert result.body == f"É {r}"
+
+    def test_bodies_shorter_than_any_match_skip_rules(self, patterns_dir):
+        import mithril_proxy.detector as det
+
+        (patterns_dir / "rules.txt").write_text("ignore\\s+previous\nsecret_data\n")
+        load_patterns(patterns_dir)
+        assert det._min_match_len(det._patterns) == 11
+        assert det._candidates("x" * 10) == []
+        assert det._patterns[1] in det._candidates("secret_data")
+        (patterns_dir / "rules.txt").write_text("secret_data\nx?\n")
+        load_patterns(patterns_dir)
+        assert det._min_match_len(det._patterns) == 0
+
+    @pytest.mark.asyncio
+    async def test_re2_engine_redacts(self, patterns_dir, monkeypatch):
+        pytest.importorskip("re2")
+        import mithril_proxy.detector as det
+
+        monkeypatch.setattr(det, "_ahocorasick", None)
+        monkeypatch.setenv("REGEX_ENGINE", "re2")
+        (patterns_dir / "rules.txt").write_text("(?:a+)+b\nIGNORE previous\n")
+        assert load_patterns(patterns_dir) == 2
+        assert not any(isinstance(p, re.Pattern) for p in det._patterns)
+        assert det._combined is not None
+        result = await scan("please ignore PREVIOUS", _dest(regex_mode="redact"))
+        assert result.detail == "IGNORE previous"
+        assert result.body == "please **REDACTED**"
+
+    @pytest.mark.asyncio
+    async def test_re2_unsupported_pattern_falls_back(self, patterns_dir, monkeypatch):
+        pytest.importorskip("re2")
+        import mithril_proxy.detector as det
+
+        monkeypatch.setenv("REGEX_ENGINE", "re2")
+        (patterns_dir / "rules.txt").write_text("safe\n(ab)\\1\n")
+        assert load_patterns(patterns_dir) == 2
+        assert isinstance(det._patterns[1], re.Pattern)
+        result = await scan("xxABab", _dest(regex_mode="monitor"))
+        assert result.detail == "(ab)\\1"
+
+    @pytest.mark.asyncio
+    async def test_hyperscan_prefilter_keeps_first_match(self, patterns_dir, monkeypatch):
+        pytest.importorskip("hyperscan")
+        import mithril_proxy.detector as det
+
+        monkeypatch.setenv("REGEX_ENGINE", "hyperscan")
+        (patterns_dir / "rules.txt").write_text("beta\nignore\\s+previous\nalpha\n")
+        load_patterns(patterns_dir)
+        assert det._hs_prefilter is not None
+        assert (await scan("nothing here", _dest(regex_mode="block"))).action == "pass"
+        result = await scan("IGNORE\u00a0previous, alpha", _dest(regex_mode="redact"))
+        assert result.detail == "ignore\\s+previous"
+        assert result.body == "**REDACTED**, alpha"
+
+    @pytest.mark.asyncio
+    async def test_hyperscan_scans_ascii_bytes_undecoded(self, patterns_dir, monkeypatch):
+        pytest.importorskip("hyperscan")
+        from mithril_proxy.detector import scan_bytes
+
+        monkeypatch.setenv("REGEX_ENGINE", "hyperscan")
+        (patterns_dir / "rules.txt").write_text("injection\n")
+        load_patterns(patterns_dir)
+        with patch("mithril_proxy.detector.scan", side_effect=AssertionError):
+            result = await scan_bytes(b'{"result": "clean"}', _dest(regex_mode="block"))
+        assert result.action == "pass"
+        hit = await scan_bytes(b'{"result": "INJECTION"}', _dest(regex_mode="block"))
+        assert hit.action == "block"
+        # Non-ASCII bodies are decoded first rather than trusted as UTF-8.
+        utf8 = await scan_bytes("caf\u00e9 injection".encode(), _dest(regex_mode="block"))
+        assert utf8.action == "block"
+
+    @pytest.mark.asyncio
+    async def test_hyperscan_leaves_unicode_case_folding_to_python(self, patterns_dir, monkeypatch):
+        pytest.importorskip("hyperscan")
+        from mithril_proxy.detector import scan_bytes
+
+        monkeypatch.setenv("REGEX_ENGINE", "hyperscan")
+        # U+0131 (dotless i) is an IGNORECASE match for "i"; Hyperscan disagrees.
+        (patterns_dir / "rules.txt").write_text("injection\nd\u0131sregard\n", encoding="utf-8")
+        load_patterns(patterns_dir)
+        result = await scan("\u0130NJECT\u0130ON here", _dest(regex_mode="block"))
+        assert result.action == "block"
+        hit = await scan_bytes(b"please DISREGARD that", _dest(regex_mode="block"))
+        assert hit.detail == "d\u0131sregard"
+
+    @pytest.mark.asyncio
+    async def test_hyperscan_rejected_rules_always_searched(self, patterns_dir, monkeypatch):
+        pytest.importorskip("hyperscan")
+        monkeypatch.setenv("REGEX_ENGINE", "hyperscan")
+        # Matches the empty string / uses Python-only "{,n}" syntax.
+        (patterns_dir / "rules.txt").write_text("beta\nx?\nab{,2}c\n")
+        load_patterns(patterns_dir)
+        result = await scan("abbc", _dest(regex_mode="monitor"))
+        assert result.detail == "x?"
+
 
 # =========================================================================== #
 #  AI engine tests                                                             #
@@ -278,6 +548,45 @@ class TestAIEngine:
         assert result.action == "monitor"
         assert result.body == body
 
+    @pytest.mark.asyncio
+    async def test_concurrent_scans_share_one_batch(self):
+        scores = {"hack": 0.95, "fine": 0.1, "evil": 0.9}
+        mock_pipeline = MagicMock(side_effect=lambda texts, **kw: [
+            {"label": "INJECTION", "score": scores[t]} for t in texts
+        ])
+        with patch("mithril_proxy.detector._ai_pipeline", mock_pipeline):
+            results = await asyncio.gather(
+                *(scan(t, _dest(ai_mode="block")) for t in ("hack", "fine", "evil"))
+            )
+        assert [r.action for r in results] == ["block", "pass", "block"]
+        mock_pipeline.assert_called_once()
+        assert mock_pipeline.call_args.args[0] == ["hack", "fine", "evil"]
+
+    @pytest.mark.asyncio
+    async def test_failing_text_does_not_fail_open_its_batch(self):
+        def pipeline(texts, **kw):
+            if "too long" in texts:
+                raise RuntimeError("input exceeds model length")
+            return [{"label": "INJECTION", "score": 0.95} for _ in texts]
+
+        with patch("mithril_proxy.detector._ai_pipeline", MagicMock(side_effect=pipeline)):
+            results = await asyncio.gather(
+                *(scan(t, _dest(ai_mode="block")) for t in ("hack", "too long", "evil"))
+            )
+        assert [r.action for r in results] == ["block", "pass", "block"]
+
+    @pytest.mark.asyncio
+    async def test_short_batch_result_rescored_per_text(self):
+        mock_pipeline = MagicMock(side_effect=lambda texts, **kw: [
+            {"label": "INJECTION", "score": 0.95}
+        ])
+        with patch("mithril_proxy.detector._ai_pipeline", mock_pipeline):
+            results = await asyncio.gather(
+                *(scan(t, _dest(ai_mode="block")) for t in ("hack", "evil"))
+            )
+        assert [r.action for r in results] == ["block", "block"]
+        assert mock_pipeline.call_count == 3
+
 
 # =========================================================================== #
 #  Strictest-mode-wins tests                                                   #
@@ -417,11 +726,8 @@ class TestLoggerDetectionFields:
 
 class TestAdminReloadEndpoint:
 
-    def test_reload_from_localhost(self, tmp_path, patterns_dir):
+    def test_reload_from_localhost(self, tmp_path, patterns_dir, admin_client):
         """Test the admin endpoint returns loaded count."""
-        from starlette.testclient import TestClient
-        from mithril_proxy.main import app
-
         (patterns_dir / "rules.txt").write_text("injection\n")
 
         with patch("mithril_proxy.main.reload_patterns") as mock_reload, \
@@ -437,16 +743,12 @@ class TestAdminReloadEndpoint:
                 "LOG_FILE": str(log_file),
                 "PATTERNS_DIR": str(patterns_dir),
             }):
-                client = TestClient(app)
-                response = client.post("/admin/reload-patterns")
+                response = admin_client.post("/admin/reload-patterns")
                 assert response.status_code == 200
                 assert response.json() == {"loaded": 1}
 
-    def test_reload_blocked_from_remote(self, tmp_path):
+    def test_reload_blocked_from_remote(self, tmp_path, admin_client):
         """Non-localhost requests to admin endpoint are rejected."""
-        from starlette.testclient import TestClient
-        from mithril_proxy.main import app
-
         config_file = tmp_path / "destinations.yml"
         config_file.write_text("destinations: {}\n")
         log_file = tmp_path / "test.log"
@@ -456,8 +758,7 @@ class TestAdminReloadEndpoint:
             "LOG_FILE": str(log_file),
         }):
             with patch("mithril_proxy.main._source_ip", return_value="192.168.1.100"):
-                client = TestClient(app)
-                response = client.post("/admin/reload-patterns")
+                response = admin_client.post("/admin/reload-patterns")
                 assert response.status_code == 403
 
 
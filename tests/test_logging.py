@@ -9,9 +9,13 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
+import subprocess
+import sys
 import threading
 import time
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
@@ -21,8 +25,7 @@ import pytest
 # --------------------------------------------------------------------------- #
 
 def _read_log_lines(path: Path) -> list[dict]:
-    lines = [ln.strip() for ln in path.read_text().splitlines() if ln.strip()]
-    return [json.loads(ln) for ln in lines]
+    return [json.loads(ln) for ln in path.read_bytes().split(b"\n") if ln.strip()]
 
 
 # --------------------------------------------------------------------------- #
@@ -36,7 +39,7 @@ class TestLogRequestFields:
         import mithril_proxy.logger as log_mod
 
         # Fresh logger for this test
-        logger = logging.getLogger(f"mithril_proxy.test_{id(self)}")
+        logger = logging.getLogger("mithril_proxy.test_fields")
         logger.handlers.clear()
         handler = logging.FileHandler(str(log_file), mode="a")
         handler.setFormatter(log_mod._JsonFormatter())
@@ -59,6 +62,7 @@ class TestLogRequestFields:
         finally:
             log_mod._logger = original_logger
             handler.close()
+            logging.Logger.manager.loggerDict.pop(logger.name, None)
 
         lines = _read_log_lines(log_file)
         assert len(lines) == 1
@@ -72,12 +76,46 @@ class TestLogRequestFields:
         assert entry["status_code"] == 200
         assert entry["latency_ms"] == 42.5
 
+    def test_log_request_skips_caller_lookup(self, tmp_path):
+        import mithril_proxy.logger as log_mod
+
+        log_file = tmp_path / "proxy.log"
+        logger = logging.getLogger("mithril_proxy.test_caller")
+        handler = logging.FileHandler(str(log_file), mode="a")
+        handler.setFormatter(log_mod._JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        original_logger = log_mod._logger
+        log_mod._logger = logger
+
+        try:
+            with patch.object(logging.Logger, "findCaller") as mock_find_caller:
+                log_mod.log_request(
+                    user="abc",
+                    source_ip="1.2.3.4",
+                    destination="dest",
+                    mcp_method="tools/list",
+                    status_code=200,
+                    latency_ms=1.0,
+                )
+        finally:
+            log_mod._logger = original_logger
+            handler.close()
+            logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+        mock_find_caller.assert_not_called()
+        [entry] = _read_log_lines(log_file)
+        assert entry["message"] == "request"
+        assert entry["level"] == "INFO"
+        assert entry["mcp_method"] == "tools/list"
+
     def test_error_field_present_when_provided(self, tmp_path):
         log_file = tmp_path / "proxy.log"
 
         import mithril_proxy.logger as log_mod
 
-        logger = logging.getLogger(f"mithril_proxy.test_err_{id(self)}")
+        logger = logging.getLogger("mithril_proxy.test_err")
         logger.handlers.clear()
         handler = logging.FileHandler(str(log_file), mode="a")
         handler.setFormatter(log_mod._JsonFormatter())
@@ -101,6 +139,7 @@ class TestLogRequestFields:
         finally:
             log_mod._logger = original_logger
             handler.close()
+            logging.Logger.manager.loggerDict.pop(logger.name, None)
 
         lines = _read_log_lines(log_file)
         assert len(lines) == 1
@@ -113,7 +152,7 @@ class TestLogRequestFields:
 
         import mithril_proxy.logger as log_mod
 
-        logger = logging.getLogger(f"mithril_proxy.test_noerr_{id(self)}")
+        logger = logging.getLogger("mithril_proxy.test_noerr")
         logger.handlers.clear()
         handler = logging.FileHandler(str(log_file), mode="a")
         handler.setFormatter(log_mod._JsonFormatter())
@@ -136,11 +175,201 @@ class TestLogRequestFields:
         finally:
             log_mod._logger = original_logger
             handler.close()
+            logging.Logger.manager.loggerDict.pop(logger.name, None)
 
         lines = _read_log_lines(log_file)
         assert "error" not in lines[0]
 
 
+# --------------------------------------------------------------------------- #
+# Request context supplies identity fields
+# --------------------------------------------------------------------------- #
+
+class TestRequestContext:
+    def test_context_fills_omitted_identity_fields(self, tmp_path):
+        log_file = tmp_path / "proxy.log"
+
+        import mithril_proxy.logger as log_mod
+
+        logger = logging.getLogger("mithril_proxy.test_ctx")
+        logger.handlers.clear()
+        handler = logging.FileHandler(str(log_file), mode="a")
+        handler.setFormatter(log_mod._JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        original_logger = log_mod._logger
+        log_mod._logger = logger
+        token = log_mod.set_request_context(
+            user="ctxuser1", source_ip="10.0.0.9", destination="ctxdest",
+        )
+        try:
+            log_mod.log_request(mcp_method=None, status_code=200, latency_ms=1.0)
+            # Explicit kwargs override the context
+            log_mod.log_request(
+                user="stdio", mcp_method=None, status_code=200, latency_ms=1.0,
+            )
+        finally:
+            log_mod.reset_request_context(token)
+            log_mod._logger = original_logger
+            handler.close()
+            logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+        first, second = _read_log_lines(log_file)
+        assert first["user"] == "ctxuser1"
+        assert first["source_ip"] == "10.0.0.9"
+        assert first["destination"] == "ctxdest"
+        assert second["user"] == "stdio"
+        assert second["destination"] == "ctxdest"
+
+
+# --------------------------------------------------------------------------- #
+# Staging handler drains records off the calling thread
+# --------------------------------------------------------------------------- #
+
+class TestStagingHandler:
+    def _logger_with(self, handler, name):
+        logger = logging.getLogger(name)
+        logger.handlers.clear()
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        return logger
+
+    def test_flush_writes_all_records_in_order(self, tmp_path):
+        import mithril_proxy.logger as log_mod
+
+        log_file = tmp_path / "proxy.log"
+        handler = log_mod._StagingHandler(log_file, batch_max=7)
+        handler.setFormatter(log_mod._JsonFormatter())
+        logger = self._logger_with(handler, "mithril_proxy.test_staging")
+        try:
+            for i in range(50):
+                logger.info("request", extra={"seq": i})
+            handler.flush()
+            lines = _read_log_lines(log_file)
+        finally:
+            handler.close()
+            logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+        assert [entry["seq"] for entry in lines] == list(range(50))
+
+    def test_burst_is_written_with_one_writev(self, tmp_path):
+        import mithril_proxy.logger as log_mod
+
+        log_file = tmp_path / "proxy.log"
+        handler = log_mod._StagingHandler(log_file, linger=5.0)
+        handler.setFormatter(log_mod._JsonFormatter())
+        logger = self._logger_with(handler, "mithril_proxy.test_staging_burst")
+        real_writev = log_mod.os.writev
+        calls: list[int] = []
+
+        def counting_writev(fd, buffers):
+            calls.append(len(buffers))
+            return real_writev(fd, buffers)
+
+        try:
+            with patch.object(log_mod.os, "writev", counting_writev):
+                for i in range(10):
+                    logger.info("request", extra={"seq": i})
+                handler.flush()  # cuts the 5 s linger short
+        finally:
+            handler.close()
+            logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+        assert calls == [10]
+        assert len(_read_log_lines(log_file)) == 10
+
+    def test_close_drains_pending_records(self, tmp_path):
+        import mithril_proxy.logger as log_mod
+
+        log_file = tmp_path / "proxy.log"
+        handler = log_mod._StagingHandler(log_file, max_staged=4)
+        handler.setFormatter(log_mod._JsonFormatter())
+        logger = self._logger_with(handler, "mithril_proxy.test_staging_close")
+        for i in range(20):
+            logger.info("request", extra={"seq": i})
+        handler.close()
+        logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+        assert len(_read_log_lines(log_file)) == 20
+
+    def test_records_staged_at_exit_are_written(self, tmp_path):
+        """logging.shutdown() at interpreter exit drains the daemon thread."""
+        log_file = tmp_path / "proxy.log"
+        script = (
+            "import logging, sys\n"
+            "import mithril_proxy.logger as log_mod\n"
+            "handler = log_mod._StagingHandler(sys.argv[1], linger=5.0)\n"
+            "handler.setFormatter(log_mod._JsonFormatter())\n"
+            "logger = logging.getLogger('mithril_proxy.exit_test')\n"
+            "logger.addHandler(handler)\n"
+            "logger.setLevel(logging.INFO)\n"
+            "for i in range(5):\n"
+            "    logger.info('request', extra={'seq': i})\n"
+        )
+        src = Path(__file__).resolve().parent.parent / "src"
+        subprocess.run(
+            [sys.executable, "-c", script, str(log_file)],
+            check=True, timeout=30, env={**os.environ, "PYTHONPATH": str(src)},
+        )
+        assert [entry["seq"] for entry in _read_log_lines(log_file)] == list(range(5))
+
+
+# --------------------------------------------------------------------------- #
+# Timestamp formatting
+# --------------------------------------------------------------------------- #
+
+class TestTimestamp:
+    def test_millisecond_iso_utc(self):
+        from mithril_proxy.logger import _timestamp
+
+        assert _timestamp(0.1234) == "1970-01-01T00:00:00.123+00:00"
+
+    def test_same_millisecond_reuses_cached_string(self):
+        from mithril_proxy.logger import _timestamp
+
+        first = _timestamp(1_700_000_000.0011)
+        assert _timestamp(1_700_000_000.0019) is first
+        assert _timestamp(1_700_000_000.0021) != first
+
+
+class TestBodyTruncator:
+    def test_limit_is_bound_at_build_time(self):
+        from mithril_proxy.logger import _make_body_truncator
+
+        truncate = _make_body_truncator(4)
+        assert truncate("abcd") == ("abcd", False)
+        assert truncate("abcdef") == ("abcd", True)
+        assert truncate(b"ab\xc3\xa9cd") == ("ab\u00e9", True)
+        assert truncate("a\u00e9\u00e9") == ("a\u00e9", True)
+
+
+class TestDumps:
+    @pytest.mark.parametrize("payload", [
+        {"message": "request", "latency_ms": 1.5, "rpc_id": None},
+        {"request_body": "caf\u00e9 \u2603", "nested": {1: "non-str key"}},
+        {"rpc_id": 2**70, "path": Path("/tmp/x")},
+    ])
+    def test_orjson_and_stdlib_agree(self, payload):
+        import mithril_proxy.logger as log_mod
+
+        fast = log_mod._dumps(payload)
+        with patch.object(log_mod, "_orjson", None):
+            slow = log_mod._dumps(payload)
+        assert json.loads(fast) == json.loads(slow)
+
+    def test_newline_appended_by_both_encoders(self):
+        import mithril_proxy.logger as log_mod
+
+        payload = {"message": "request", "rpc_id": 2**70}
+        assert log_mod._dumps({"message": "x"}, newline=True).endswith(b'"}\n')
+        assert log_mod._dumps(payload, newline=True) == log_mod._dumps(payload) + b"\n"
+        with patch.object(log_mod, "_orjson", None):
+            assert log_mod._dumps(payload, newline=True).count(b"\n") == 1
+
+
 # --------------------------------------------------------------------------- #
 # Concurrent writes do not corrupt or interleave lines
 # --------------------------------------------------------------------------- #
@@ -151,7 +380,7 @@ class TestConcurrentLogging:
 
         import mithril_proxy.logger as log_mod
 
-        logger = logging.getLogger(f"mithril_proxy.test_concurrent_{id(self)}")
+        logger = logging.getLogger("mithril_proxy.test_concurrent")
         logger.handlers.clear()
         handler = logging.FileHandler(str(log_file), mode="a")
         handler.setFormatter(log_mod._JsonFormatter())
@@ -186,6 +415,7 @@ class TestConcurrentLogging:
 
         log_mod._logger = original_logger
         handler.close()
+        logging.Logger.manager.loggerDict.pop(logger.name, None)
 
         assert not errors, f"Exceptions during concurrent writes: {errors}"
 
@@ -3,6 +3,8 @@ from __future__ import annotations
 
 import asyncio
 import json
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from typing import AsyncIterator
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -10,6 +12,10 @@ import httpx
 import pytest
 from fastapi.testclient import TestClient
 
+# One FastAPI instance per process: importing main builds the route table
+# once, and fixtures only swap the config and logger it reads at request time.
+from mithril_proxy.main import app as _APP
+
 # --------------------------------------------------------------------------- #
 # App fixture with in-memory config + temp log file
 # --------------------------------------------------------------------------- #
@@ -19,18 +25,27 @@ def tmp_log(tmp_path):
     return tmp_path / "proxy.log"
 
 
-@pytest.fixture()
-def app(tmp_log, tmp_path):
-    """Return a configured FastAPI app with a minimal in-memory destination."""
-    destinations_yml = tmp_path / "destinations.yml"
-    destinations_yml.write_text(
+@pytest.fixture(scope="module")
+def destinations(tmp_path_factory):
+    """Destinations parsed once per module from a minimal destinations.yml."""
+    import mithril_proxy.config as cfg
+
+    path = tmp_path_factory.mktemp("proxy_config") / "destinations.yml"
+    path.write_text(
         "destinations:\n  testdest:\n    url: http://upstream.example.com\n"
     )
+    cfg.load_config(path=path)
+    return cfg._destinations
+
 
+@pytest.fixture()
+def app(tmp_log, destinations):
+    """Return a configured FastAPI app with a minimal in-memory destination."""
     import mithril_proxy.config as cfg
     import mithril_proxy.logger as log_mod
 
-    cfg.load_config(path=destinations_yml)
+    # Other modules load their own config; swap this module's back in.
+    cfg._destinations = destinations
 
     import logging
     logger = logging.getLogger("mithril_proxy")
@@ -41,8 +56,58 @@ def app(tmp_log, tmp_path):
     logger.setLevel(logging.INFO)
     log_mod._logger = logger
 
-    from mithril_proxy.main import app as fastapi_app
-    return fastapi_app
+    yield _APP
+    handler.close()
+    logger.removeHandler(handler)
+
+
+@pytest.fixture(scope="module")
+def client():
+    """TestClient shared across the module.
+
+    ``app`` always returns ``_APP``, so tests request ``app`` for per-test
+    config and reuse this client to call it.
+    """
+    return TestClient(_APP, raise_server_exceptions=False)
+
+
+@dataclass
+class _FakeResponse:
+    """The parts of ``httpx.Response`` the proxy reads from a buffered upstream reply."""
+
+    status_code: int
+    content: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class _FakeSseUpstream:
+    """Streaming upstream response whose ``aiter_bytes()`` yields *chunks*."""
+
+    status_code = 200
+
+    def __init__(self, chunks: list[bytes]) -> None:
+        self._chunks = chunks
+
+    async def aiter_bytes(self) -> AsyncIterator[bytes]:
+        for chunk in self._chunks:
+            yield chunk
+
+
+class _FakeSseClient:
+    """Stand-in for ``httpx.AsyncClient`` in handle_sse: ``stream()`` yields *upstream*."""
+
+    def __init__(self, upstream: _FakeSseUpstream) -> None:
+        self._upstream = upstream
+
+    async def __aenter__(self) -> "_FakeSseClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        yield self._upstream
 
 
 # --------------------------------------------------------------------------- #
@@ -50,8 +115,7 @@ def app(tmp_log, tmp_path):
 # --------------------------------------------------------------------------- #
 
 class TestHealthCheck:
-    def test_health_returns_ok(self, app):
-        client = TestClient(app, raise_server_exceptions=False)
+    def test_health_returns_ok(self, app, client):
         resp = client.get("/health")
         assert resp.status_code == 200
         assert resp.json() == {"status": "ok"}
@@ -62,26 +126,22 @@ class TestHealthCheck:
 # --------------------------------------------------------------------------- #
 
 class TestUnknownDestination:
-    def test_sse_unknown_destination_returns_404(self, app):
-        client = TestClient(app, raise_server_exceptions=False)
+    def test_sse_unknown_destination_returns_404(self, app, client):
         resp = client.get("/nonexistent/sse")
         assert resp.status_code == 404
         body = resp.json()
         assert "error" in body
         assert "nonexistent" in body["error"]
 
-    def test_message_unknown_destination_returns_404(self, app):
-        client = TestClient(app, raise_server_exceptions=False)
+    def test_message_unknown_destination_returns_404(self, app, client):
         resp = client.post("/nonexistent/message?session_id=abc", json={"jsonrpc": "2.0", "method": "ping", "id": 1})
         assert resp.status_code == 404
 
-    def test_message_missing_session_id_returns_400(self, app):
-        client = TestClient(app, raise_server_exceptions=False)
+    def test_message_missing_session_id_returns_400(self, app, client):
         resp = client.post("/testdest/message", json={"jsonrpc": "2.0", "method": "ping", "id": 1})
         assert resp.status_code == 400
 
-    def test_message_unknown_session_returns_404(self, app):
-        client = TestClient(app, raise_server_exceptions=False)
+    def test_message_unknown_session_returns_404(self, app, client):
         resp = client.post("/testdest/message?session_id=does-not-exist", json={})
         assert resp.status_code == 404
 
@@ -101,6 +161,171 @@ class TestEndpointRewriting:
         )
         assert result == "/testdest/message?session_id=abc123"
 
+    async def _relay(self, app, chunks: list[bytes]) -> tuple[bytes, AsyncMock]:
+        """GET /testdest/sse against an upstream that sends *chunks* verbatim."""
+        transport = httpx.ASGITransport(app=app)
+        test_client = httpx.AsyncClient(transport=transport, base_url="http://test")
+        upstream_client = _FakeSseClient(_FakeSseUpstream(chunks))
+        with patch("mithril_proxy.proxy.httpx.AsyncClient", return_value=upstream_client), \
+                patch("mithril_proxy.proxy._register_session", new_callable=AsyncMock) as register:
+            async with test_client:
+                resp = await test_client.get("/testdest/sse")
+        return resp.content, register
+
+    @pytest.mark.asyncio
+    async def test_endpoint_event_split_across_chunks_is_rewritten(self, app):
+        body, register = await self._relay(app, [
+            b"event: endpo",
+            b"int\r\ndata: /messages?sess",
+            b"ionId=abc\r\n\r\n",
+        ])
+        assert body == b"event: endpoint\ndata: /testdest/message?session_id=abc\n\n"
+        register.assert_awaited_once_with(
+            "abc", "http://upstream.example.com/messages?sessionId=abc"
+        )
+
+    @pytest.mark.asyncio
+    async def test_other_events_relayed_byte_for_byte(self, app):
+        events = b'event: message\r\ndata: {"id":1}\r\n\r\n: keep-alive\n\n'
+        body, register = await self._relay(app, [events[:20], events[20:]])
+        assert body == events
+        register.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_cr_only_endpoint_event_is_rewritten_before_eof(self, app):
+        registered_before_eof: list[bool] = []
+
+        class _StallingUpstream(_FakeSseUpstream):
+            async def aiter_bytes(self) -> AsyncIterator[bytes]:
+                async for chunk in super().aiter_bytes():
+                    yield chunk
+                # Resumed only once the relay has handled the last chunk.
+                registered_before_eof.append(register.await_count == 1)
+
+        transport = httpx.ASGITransport(app=app)
+        test_client = httpx.AsyncClient(transport=transport, base_url="http://test")
+        upstream = _StallingUpstream([b"event: endpoint\rdata: /messages?sess", b"ionId=abc\r\r"])
+        with patch("mithril_proxy.proxy.httpx.AsyncClient", return_value=_FakeSseClient(upstream)), \
+                patch("mithril_proxy.proxy._register_session", new_callable=AsyncMock) as register:
+            async with test_client:
+                resp = await test_client.get("/testdest/sse")
+        assert registered_before_eof == [True]
+        assert resp.content == b"event: endpoint\ndata: /testdest/message?session_id=abc\n\n"
+
+    @pytest.mark.asyncio
+    async def test_crlf_split_across_chunks_is_one_line_end(self, app):
+        body, register = await self._relay(app, [
+            b"event: endpoint\r",
+            b"\ndata: /messages?sessionId=abc\r",
+            b"\n\r\n",
+        ])
+        # The closing blank line holds no "endpoint", so it is relayed raw.
+        assert body == b"event: endpoint\ndata: /testdest/message?session_id=abc\n\r\n"
+        register.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_trailing_partial_line_flushed_at_eof(self, app):
+        body, _ = await self._relay(app, [b"event: message\ndata: tail"])
+        assert body == b"event: message\ndata: tail\n"
+
+
+# --------------------------------------------------------------------------- #
+# JSON-RPC envelope extraction for logging
+# --------------------------------------------------------------------------- #
+
+class TestJsonRpcMethodAndId:
+    def test_object_body_returns_method_and_id(self):
+        from mithril_proxy.proxy import _jsonrpc_method_and_id
+
+        body = b'  {"jsonrpc":"2.0","method":"tools/list","id":3}'
+        assert _jsonrpc_method_and_id(body) == ("tools/list", 3)
+
+    def test_non_object_body_skips_parse(self):
+        from mithril_proxy.proxy import _jsonrpc_method_and_id
+
+        with patch("mithril_proxy.proxy.json.loads") as mock_loads:
+            assert _jsonrpc_method_and_id(b"not valid json at all") == (None, None)
+            assert _jsonrpc_method_and_id(b"[1, 2]") == (None, None)
+        mock_loads.assert_not_called()
+
+    def test_malformed_object_returns_none(self):
+        from mithril_proxy.proxy import _jsonrpc_method_and_id
+
+        assert _jsonrpc_method_and_id(b"{not json") == (None, None)
+
+    @pytest.mark.parametrize("body", [
+        b'{"jsonrpc":"2.0","id":7,"method":"tools/call","params":{"method":"x","id":1}}',
+        b'{"params":{"method":"inner","id":1},"method":"outer","id":2}',
+        b'{"jsonrpc":"2.0","method":"notifications/initialized","id":null}',
+        b'{"jsonrpc":"2.0","method":"a","id":"req-\\"1"}',
+        b'{"jsonrpc":"2.0","method":"a","id":1.5}',
+        b'{"jsonrpc":"2.0","method":"caf\xc3\xa9","id":-3}',
+        b'{"method":"a","method":"tools/call","id":1}',
+        b'{"method":"tools/call","id":1,"id":2}',
+        b'{"method":"a","id":1,"method":"b"}',
+        b'{"params":{},"method":"a","method":"tools/call","id":1}',
+    ])
+    def test_regex_fast_path_matches_full_parse(self, body):
+        from mithril_proxy.proxy import _jsonrpc_method_and_id
+
+        payload = json.loads(body)
+        assert _jsonrpc_method_and_id(body) == (payload.get("method"), payload.get("id"))
+
+    def test_regex_fast_path_skips_parse(self):
+        from mithril_proxy.proxy import _jsonrpc_method_and_id
+
+        body = b'{"jsonrpc":"2.0","id":4,"method":"tools/list","params":{}}'
+        with patch("mithril_proxy.proxy.json.loads") as mock_loads, \
+                patch("mithril_proxy.proxy._simdjson_parser", None):
+            assert _jsonrpc_method_and_id(body) == ("tools/list", 4)
+        mock_loads.assert_not_called()
+
+    @pytest.mark.parametrize("backend", ["simdjson", "msgspec", "stdlib"])
+    def test_parser_backends_agree(self, backend):
+        import mithril_proxy.proxy as proxy_mod
+
+        parser = proxy_mod._simdjson_parser if backend == "simdjson" else None
+        decoder = proxy_mod._envelope_decoder if backend == "msgspec" else None
+        if backend != "stdlib" and parser is None and decoder is None:
+            pytest.skip(f"{backend} not installed")
+        body = b'{"jsonrpc":"2.0","method":"tools/call","params":{"a":[1,{"b":2}]},"id":"x1"}'
+        with patch.object(proxy_mod, "_simdjson_parser", parser), \
+                patch.object(proxy_mod, "_envelope_decoder", decoder):
+            assert proxy_mod._jsonrpc_method_and_id(body) == ("tools/call", "x1")
+            # A second parse must not trip over a document from the first
+            assert proxy_mod._jsonrpc_method_and_id(body) == ("tools/call", "x1")
+            assert proxy_mod._jsonrpc_method_and_id(b"{not json") == (None, None)
+
+    @pytest.mark.parametrize("backend", ["simdjson", "msgspec", "stdlib"])
+    def test_big_integer_params_still_parse(self, backend):
+        import mithril_proxy.proxy as proxy_mod
+
+        parser = proxy_mod._simdjson_parser if backend == "simdjson" else None
+        decoder = proxy_mod._envelope_decoder if backend == "msgspec" else None
+        if backend != "stdlib" and parser is None and decoder is None:
+            pytest.skip(f"{backend} not installed")
+        # Wider than 64 bits: simdjson rejects it, json and msgspec do not.
+        body = (
+            b'{"jsonrpc":"2.0","params":{"n":123456789012345678901234567890},'
+            b'"method":"tools/call","id":1}'
+        )
+        with patch.object(proxy_mod, "_simdjson_parser", parser), \
+                patch.object(proxy_mod, "_envelope_decoder", decoder):
+            assert proxy_mod._jsonrpc_method_and_id(body) == ("tools/call", 1)
+
+    @pytest.mark.parametrize("backend", ["simdjson", "msgspec", "stdlib"])
+    def test_deeply_nested_body_returns_none(self, backend):
+        import mithril_proxy.proxy as proxy_mod
+
+        parser = proxy_mod._simdjson_parser if backend == "simdjson" else None
+        decoder = proxy_mod._envelope_decoder if backend == "msgspec" else None
+        if backend != "stdlib" and parser is None and decoder is None:
+            pytest.skip(f"{backend} not installed")
+        body = b'{"params":' + b"[" * 100_000 + b"]" * 100_000 + b',"method":"m","id":1}'
+        with patch.object(proxy_mod, "_simdjson_parser", parser), \
+                patch.object(proxy_mod, "_envelope_decoder", decoder):
+            assert proxy_mod._jsonrpc_method_and_id(body) == (None, None)
+
 
 # --------------------------------------------------------------------------- #
 # Message forwarding — upstream success
@@ -115,13 +340,10 @@ class TestMessageForwarding:
         # Manually register a session
         await proxy._register_session(session_id, "http://upstream.example.com/messages?sessionId=sess-xyz")
 
-        mock_response = MagicMock(spec=httpx.Response)
-        mock_response.status_code = 202
-        mock_response.content = b""
-        mock_response.headers = {"content-type": "application/json"}
+        upstream = _FakeResponse(202, headers={"content-type": "application/json"})
 
         with patch("mithril_proxy.proxy._connect_with_retries", new_callable=AsyncMock) as mock_conn:
-            mock_conn.return_value = mock_response
+            mock_conn.return_value = upstream
 
             transport = httpx.ASGITransport(app=app)
             async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
@@ -140,6 +362,32 @@ class TestMessageForwarding:
         # Clean up
         await proxy._remove_session(session_id)
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("chunked", [False, True])
+    async def test_body_over_cap_rejected_before_upstream(self, app, tmp_log, chunked):
+        from mithril_proxy import proxy
+
+        session_id = "sess-big"
+        await proxy._register_session(session_id, "http://upstream.example.com/messages?sessionId=sess-big")
+        body = b'{"jsonrpc":"2.0","method":"tools/call","params":{"x":"' + b"a" * 200 + b'"},"id":1}'
+
+        async def body_chunks():
+            for i in range(0, len(body), 64):
+                yield body[i:i + 64]
+
+        with patch("mithril_proxy.utils._MAX_REQUEST_BODY_BYTES", 128), \
+                patch("mithril_proxy.proxy._connect_with_retries", new_callable=AsyncMock) as mock_conn:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post(
+                    f"/testdest/message?session_id={session_id}",
+                    content=body_chunks() if chunked else body,
+                )
+
+        assert resp.status_code == 413
+        mock_conn.assert_not_called()
+        await proxy._remove_session(session_id)
+
 
 # --------------------------------------------------------------------------- #
 # Retry behaviour
@@ -160,12 +408,13 @@ class TestRetries:
 
         mock_client = MagicMock(spec=httpx.AsyncClient)
         mock_client.request = fake_request
+        sleep = AsyncMock()
 
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            with pytest.raises(httpx.ConnectError):
-                await _connect_with_retries(mock_client, "POST", "http://bad.host/")
+        with pytest.raises(httpx.ConnectError):
+            await _connect_with_retries(mock_client, "POST", "http://bad.host/", sleep=sleep)
 
         assert call_count == 3
+        assert [c.args for c in sleep.await_args_list] == [(0.5,), (1.0,)]
 
     @pytest.mark.asyncio
     async def test_no_retry_on_4xx(self):
@@ -177,9 +426,7 @@ class TestRetries:
         async def fake_request(method, url, **kwargs):
             nonlocal call_count
             call_count += 1
-            resp = MagicMock(spec=httpx.Response)
-            resp.status_code = 401
-            return resp
+            return _FakeResponse(401)
 
         mock_client = MagicMock(spec=httpx.AsyncClient)
         mock_client.request = fake_request
@@ -1,7 +1,9 @@
 """Tests for the stdio → Streamable HTTP bridge.
 
-Each test that spawns a real subprocess writes a helper script to tmp_path
-to avoid shell metacharacters that load_config() rejects.
+Stdio destinations are served in-process: ``in_process_servers`` replaces
+``bridge._spawn_process`` with a fake process whose stdio is driven by a
+Python line handler picked by the destination's ``command``.  test_bridge
+keeps a real child for the pipe path itself.
 """
 from __future__ import annotations
 
@@ -9,10 +11,22 @@ import asyncio
 import json
 import logging
 import uuid
-from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, List, Optional
 
 import httpx
 import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+try:
+    import orjson as _orjson
+except ImportError:  # optional, as in logger.py
+    _orjson = None  # type: ignore[assignment]
+
+# A single app object serves every fixture; its route table is built once at
+# import and fixtures only swap the config and logger it reads per request.
+from mithril_proxy.main import app as _APP
 
 _UUID_A = "00000000-0000-4000-8000-000000000001"
 
@@ -20,206 +34,373 @@ _UUID_A = "00000000-0000-4000-8000-000000000001"
 # Fixtures
 # --------------------------------------------------------------------------- #
 
+def _reset_bridges() -> None:
+    import mithril_proxy.bridge as bridge_mod
+
+    # Signal everything before clearing; the in-process servers exit inside
+    # terminate(), so there is nothing left to reap afterwards.
+    for b in list(bridge_mod._stdio_bridges.values()):
+        if b.process is not None:
+            bridge_mod._terminate_process(b.process)
+    bridge_mod._stdio_bridges.clear()
+    bridge_mod._bridges_create_lock = None
+
+
 @pytest.fixture(autouse=True)
 def reset_bridge_state():
-    """Clear bridge state and terminate orphaned subprocesses between tests.
+    """Clear bridge state and stop leftover servers between tests.
 
     Must be synchronous: each async test runs in its own event loop, so tasks
     created in a previous test's loop are already dead. We only need to
-    terminate subprocesses and clear the shared dicts.
+    stop the servers and clear the shared dicts.
     """
-    import mithril_proxy.bridge as bridge_mod
-    # Terminate any leftover subprocesses from previous test
-    for b in list(bridge_mod._stdio_bridges.values()):
-        if b.process and b.process.returncode is None:
-            try:
-                b.process.terminate()
-            except ProcessLookupError:
-                pass
-    bridge_mod._stdio_bridges.clear()
-    bridge_mod._bridges_create_lock = None
+    _reset_bridges()
     yield
-    for b in list(bridge_mod._stdio_bridges.values()):
-        if b.process and b.process.returncode is None:
-            try:
-                b.process.terminate()
-            except ProcessLookupError:
-                pass
-    bridge_mod._stdio_bridges.clear()
-    bridge_mod._bridges_create_lock = None
+    _reset_bridges()
 
 
-@pytest.fixture()
-def tmp_log(tmp_path):
-    return tmp_path / "test.log"
+@pytest.fixture(autouse=True)
+def fast_response_timeout(monkeypatch):
+    """Bound the per-request subprocess wait at 2 s instead of the 30 s default.
+
+    The in-process servers answer immediately, so this only shortens failure
+    paths: a server that never replies fails the test quickly with a 504
+    instead of stalling the run.
+    """
+    import mithril_proxy.bridge as bridge_mod
+
+    monkeypatch.setattr(bridge_mod, "STDIO_RESPONSE_TIMEOUT_SECS", 2.0)
+
+
+class _ListHandler(logging.Handler):
+    """Keeps formatted records in memory; nothing in this module reads a log file.
+
+    Records still go through ``_JsonFormatter`` so a field it cannot encode
+    fails here as it would in production, just without the write() per line.
+    """
+
+    def __init__(self) -> None:
+        import mithril_proxy.logger as log_mod
+
+        super().__init__()
+        self.setFormatter(log_mod._JsonFormatter())
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
 
 
 @pytest.fixture()
-def setup_logger(tmp_log):
+def setup_logger():
     import mithril_proxy.logger as log_mod
 
     logger = logging.getLogger("mithril_proxy_test_sh")
     logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
-    handler.setFormatter(log_mod._JsonFormatter())
-    logger.addHandler(handler)
+    logger.addHandler(_ListHandler())
     logger.setLevel(logging.DEBUG)
     log_mod._logger = logger
     yield logger
     log_mod._logger = None
+    logger.handlers.clear()
 
 
-def _make_echo_script(tmp_path: Path) -> Path:
-    """Subprocess that echoes each JSON-RPC request back as a response."""
-    script = tmp_path / "echo_mcp.py"
-    script.write_text(
-        "import sys, json\n"
-        "for line in sys.stdin:\n"
-        "    line = line.strip()\n"
-        "    if not line:\n"
-        "        continue\n"
-        "    try:\n"
-        "        req = json.loads(line)\n"
-        "        resp = {'jsonrpc': '2.0', 'id': req.get('id'), 'result': {}}\n"
-        "        print(json.dumps(resp), flush=True)\n"
-        "    except Exception:\n"
-        "        pass\n"
-    )
-    return script
-
-
-def _make_notification_script(tmp_path: Path) -> Path:
-    """Subprocess that sends a notification before responding to the 2nd+ request."""
-    script = tmp_path / "notif_mcp.py"
-    script.write_text(
-        "import sys, json\n"
-        "count = 0\n"
-        "for line in sys.stdin:\n"
-        "    line = line.strip()\n"
-        "    if not line:\n"
-        "        continue\n"
-        "    try:\n"
-        "        req = json.loads(line)\n"
-        "        count += 1\n"
-        "        if count > 1:\n"
-        "            notif = {'jsonrpc': '2.0', 'method': 'notifications/test', 'params': {}}\n"
-        "            print(json.dumps(notif), flush=True)\n"
-        "        resp = {'jsonrpc': '2.0', 'id': req.get('id'), 'result': {'count': count}}\n"
-        "        print(json.dumps(resp), flush=True)\n"
-        "    except Exception:\n"
-        "        pass\n"
-    )
-    return script
-
-
-def _make_one_shot_script(tmp_path: Path) -> Path:
-    """Subprocess that responds once, then exits without responding to further requests."""
-    script = tmp_path / "oneshot_mcp.py"
-    script.write_text(
-        "import sys, json\n"
-        "count = 0\n"
-        "for line in sys.stdin:\n"
-        "    line = line.strip()\n"
-        "    if not line:\n"
-        "        continue\n"
-        "    try:\n"
-        "        req = json.loads(line)\n"
-        "        count += 1\n"
-        "        if count == 1:\n"
-        "            resp = {'jsonrpc': '2.0', 'id': req.get('id'), 'result': {}}\n"
-        "            print(json.dumps(resp), flush=True)\n"
-        "        else:\n"
-        "            sys.exit(0)\n"
-        "    except Exception:\n"
-        "        pass\n"
-    )
-    return script
+# The fake servers' wire encoding: compact JSON bytes.
+if _orjson is not None:
+    _dumps: Callable[[Any], bytes] = _orjson.dumps
+    _loads: Callable[[bytes], Any] = _orjson.loads
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    _loads = json.loads
+
+
+# An in-process "MCP server": given one stdin line, returns the stdout lines
+# to write back, or None to exit.
+_LineHandler = Callable[[bytes], Optional[List[bytes]]]
+
+
+class _InProcessServer:
+    """Stand-in for ``asyncio.subprocess.Process`` driven by a line handler.
+
+    Each complete line written to ``stdin`` goes to the handler, and its
+    replies are fed to ``stdout`` straight away, so the bridge's reader sees
+    the same byte stream a real child would produce without a fork/exec.
+    """
+
+    pid = 0
+
+    def __init__(self, handler: _LineHandler) -> None:
+        self.returncode: int | None = None
+        self.stdin = self
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self._handler = handler
+        self._partial = b""
+        self._exited = asyncio.Event()
+
+    def write(self, data: bytes) -> None:
+        if self.returncode is not None:
+            raise BrokenPipeError("in-process server has exited")
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            replies = self._handler(line)
+            if replies is None:
+                self._exit(0)
+                return
+            for reply in replies:
+                self.stdout.feed_data(reply + b"\n")
+
+    async def drain(self) -> None:
+        return None
+
+    def terminate(self) -> None:
+        self._exit(-15)
+
+    def kill(self) -> None:
+        self._exit(-9)
+
+    def _exit(self, code: int) -> None:
+        if self.returncode is None:
+            self.returncode = code
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+            self._exited.set()
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        return self.returncode
+
+
+def _echo_server() -> _LineHandler:
+    """Echo each request line back unchanged, like ``cat``."""
+    return lambda line: [line]
+
+
+_TEST_NOTIFICATION = _dumps({"jsonrpc": "2.0", "method": "notifications/test", "params": {}})
+
+
+def _notification_server() -> _LineHandler:
+    """Send a notification before responding to the 2nd+ request."""
+    count = 0
+
+    def handle(line: bytes) -> list[bytes]:
+        nonlocal count
+        req = _loads(line)
+        count += 1
+        resp = {"jsonrpc": "2.0", "id": req.get("id"), "result": {"count": count}}
+        if count > 1:
+            return [_TEST_NOTIFICATION, _dumps(resp)]
+        return [_dumps(resp)]
+
+    return handle
+
+
+def _one_shot_server() -> _LineHandler:
+    """Respond once, then exit without responding to further requests."""
+    answered = False
+
+    def handle(line: bytes) -> Optional[list[bytes]]:
+        nonlocal answered
+        if answered:
+            return None
+        answered = True
+        resp = {"jsonrpc": "2.0", "id": _loads(line).get("id"), "result": {}}
+        return [_dumps(resp)]
+
+    return handle
+
+
+# destinations.yml ``command`` → server factory; each spawn gets fresh state.
+_SERVERS: dict[str, Callable[[], _LineHandler]] = {
+    "echo-mcp": _echo_server,
+    "notif-mcp": _notification_server,
+    "oneshot-mcp": _one_shot_server,
+}
+
+
+@pytest.fixture(autouse=True)
+def in_process_servers(monkeypatch):
+    """Serve stdio destinations in-process instead of spawning a child."""
+    import mithril_proxy.bridge as bridge_mod
+
+    async def spawn(command: str, extra_env: dict[str, str]) -> _InProcessServer:
+        return _InProcessServer(_SERVERS[command]())
+
+    monkeypatch.setattr(bridge_mod, "_spawn_process", spawn)
 
 
 @pytest.fixture()
-def app_with_echo_stdio(tmp_log, tmp_path):
-    """FastAPI app with one echo stdio destination and one SSE destination."""
-    script = _make_echo_script(tmp_path)
-    destinations_yml = tmp_path / "destinations.yml"
-    destinations_yml.write_text(
+def no_spawn(monkeypatch):
+    """For error-path tests: fail if the bridge tries to start a server at all."""
+    import mithril_proxy.bridge as bridge_mod
+
+    spawned: list[str] = []
+
+    async def spawn(command: str, extra_env: dict[str, str]) -> _InProcessServer:
+        spawned.append(command)
+        raise OSError("error-path request reached _spawn_process")
+
+    monkeypatch.setattr(bridge_mod, "_spawn_process", spawn)
+    yield
+    assert not spawned, f"rejected request spawned {spawned}"
+
+
+class _FakeClient:
+    __slots__ = ("host",)
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+
+
+class _FakeRequest:
+    """Just enough of ``Request`` for the stdio POST handler's validation path."""
+
+    __slots__ = ("headers", "client", "_body")
+
+    def __init__(self, body: bytes, headers: dict[str, str]) -> None:
+        self.headers = headers
+        self.client = _FakeClient("127.0.0.1")
+        self._body = body
+
+    async def body(self) -> bytes:
+        return self._body
+
+
+def _drain(q: asyncio.Queue) -> list:
+    """Return everything queued on *q* right now, leaving it empty."""
+    items = []
+    try:
+        while True:
+            items.append(q.get_nowait())
+    except asyncio.QueueEmpty:
+        return items
+
+
+async def _post_echo_direct(body: bytes, session_id: str | None = None):
+    """Call the stdio POST handler for ``echo`` without the httpx/ASGI round trip.
+
+    For requests the handler rejects before touching the subprocess; routing
+    through the app is covered by the end-to-end tests in this module.
+    """
+    from mithril_proxy.bridge import handle_stdio_streamable_http_post
+    from mithril_proxy.config import DestinationConfig
+
+    headers = {} if session_id is None else {"mcp-session-id": session_id}
+    dest_config = DestinationConfig(type="stdio", command="echo-mcp")
+    return await handle_stdio_streamable_http_post(
+        _FakeRequest(body, headers), "echo", dest_config, {}
+    )
+
+
+@pytest.fixture(scope="module")
+def config_dir(tmp_path_factory):
+    """Write the per-fixture destinations files once per module."""
+    d = tmp_path_factory.mktemp("stdio_cfg")
+    (d / "echo.yml").write_text(
         "destinations:\n"
         "  echo:\n"
         "    type: stdio\n"
-        f"    command: python3 {script}\n"
+        "    command: echo-mcp\n"
         "  ssedest:\n"
         "    url: http://upstream.example.com\n"
     )
+    (d / "notif.yml").write_text(
+        "destinations:\n"
+        "  notif:\n"
+        "    type: stdio\n"
+        "    command: notif-mcp\n"
+    )
+    (d / "oneshot.yml").write_text(
+        "destinations:\n"
+        "  oneshot:\n"
+        "    type: stdio\n"
+        "    command: oneshot-mcp\n"
+    )
+    return d
+
+
+@pytest.fixture(scope="module")
+def build_app(config_dir):
+    """Return ``build(name)``: the app, configured from ``config_dir/name``.
+
+    Each file is parsed by load_config() once per module; later builds swap
+    the parsed destinations back in, since other fixtures may have loaded a
+    different file in between.  The ``mithril_proxy`` logger gets one
+    in-memory handler for the whole module.
+    """
     import mithril_proxy.config as cfg
     import mithril_proxy.logger as log_mod
 
-    cfg.load_config(path=destinations_yml)
-
     logger = logging.getLogger("mithril_proxy")
     logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
-    handler.setFormatter(log_mod._JsonFormatter())
+    handler = _ListHandler()
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
-    log_mod._logger = logger
+    parsed: dict[str, dict] = {}
+
+    def build(name: str):
+        if name not in parsed:
+            cfg.load_config(path=config_dir / name)
+            parsed[name] = cfg._destinations
+        cfg._destinations = parsed[name]
+        log_mod._logger = logger
+        return _APP
 
-    from mithril_proxy.main import app as fastapi_app
-    return fastapi_app
+    yield build
+    handler.close()
+    logger.removeHandler(handler)
 
 
 @pytest.fixture()
-def app_with_notif_stdio(tmp_log, tmp_path):
-    """FastAPI app with the notification subprocess."""
-    script = _make_notification_script(tmp_path)
-    destinations_yml = tmp_path / "destinations.yml"
-    destinations_yml.write_text(
-        "destinations:\n"
-        "  notif:\n"
-        "    type: stdio\n"
-        f"    command: python3 {script}\n"
-    )
-    import mithril_proxy.config as cfg
-    import mithril_proxy.logger as log_mod
+def app_with_echo_stdio(build_app):
+    """FastAPI app with one echo stdio destination and one SSE destination.
 
-    cfg.load_config(path=destinations_yml)
+    The echo server returns each request line unchanged; the bridge matches
+    it by internal id and restores the client id, which is all these tests need.
+    """
+    return build_app("echo.yml")
 
-    logger = logging.getLogger("mithril_proxy")
-    logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
-    handler.setFormatter(log_mod._JsonFormatter())
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
-    log_mod._logger = logger
 
-    from mithril_proxy.main import app as fastapi_app
-    return fastapi_app
+@pytest.fixture()
+def app_with_notif_stdio(build_app):
+    """FastAPI app with the notification server."""
+    return build_app("notif.yml")
 
 
 @pytest.fixture()
-def app_with_oneshot_stdio(tmp_log, tmp_path):
-    """FastAPI app with the one-shot subprocess (responds once, then exits)."""
-    script = _make_one_shot_script(tmp_path)
-    destinations_yml = tmp_path / "destinations.yml"
-    destinations_yml.write_text(
-        "destinations:\n"
-        "  oneshot:\n"
-        "    type: stdio\n"
-        f"    command: python3 {script}\n"
-    )
-    import mithril_proxy.config as cfg
-    import mithril_proxy.logger as log_mod
+def app_with_oneshot_stdio(build_app):
+    """FastAPI app with the one-shot server (responds once, then exits)."""
+    return build_app("oneshot.yml")
 
-    cfg.load_config(path=destinations_yml)
 
-    logger = logging.getLogger("mithril_proxy")
-    logger.handlers.clear()
-    handler = logging.FileHandler(str(tmp_log), mode="a")
-    handler.setFormatter(log_mod._JsonFormatter())
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
-    log_mod._logger = logger
+@asynccontextmanager
+async def _asgi_client(app) -> AsyncIterator[httpx.AsyncClient]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
 
-    from mithril_proxy.main import app as fastapi_app
-    return fastapi_app
+
+# Per test, not per module: every async test gets a fresh event loop, and the
+# bridge tasks a request starts belong to that loop.
+@pytest_asyncio.fixture()
+async def client(app_with_echo_stdio):
+    async with _asgi_client(app_with_echo_stdio) as c:
+        yield c
+
+
+@pytest_asyncio.fixture()
+async def notif_client(app_with_notif_stdio):
+    async with _asgi_client(app_with_notif_stdio) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def sync_client():
+    """TestClient for requests that need no event loop of the test's own."""
+    return TestClient(_APP, raise_server_exceptions=False)
 
 
 # --------------------------------------------------------------------------- #
@@ -227,23 +408,19 @@ def app_with_oneshot_stdio(tmp_log, tmp_path):
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_first_post_creates_session(app_with_echo_stdio, setup_logger):
+async def test_first_post_creates_session(client, setup_logger):
     """First POST /mcp (no session header) spawns subprocess and returns Mcp-Session-Id."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        resp = await client.post(
-            "/echo/mcp",
-            json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
-        )
+    resp = await client.post(
+        "/echo/mcp",
+        json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    )
     assert resp.status_code == 200
     assert "mcp-session-id" in resp.headers
     session_id = resp.headers["mcp-session-id"]
-    # Must be a valid UUID v4
-    import re
-    assert re.match(
-        r"^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$",
-        session_id,
-    )
+    # Must be a valid UUID v4, in canonical lowercase form
+    parsed = uuid.UUID(session_id)
+    assert (parsed.version, parsed.variant) == (4, uuid.RFC_4122)
+    assert str(parsed) == session_id
     body = resp.json()
     assert body["id"] == 1  # original id restored
 
@@ -253,24 +430,22 @@ async def test_first_post_creates_session(app_with_echo_stdio, setup_logger):
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_second_post_routes_to_same_subprocess(app_with_echo_stdio, setup_logger):
+async def test_second_post_routes_to_same_subprocess(client, setup_logger):
     """Second POST with valid Mcp-Session-Id routes to existing subprocess."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        # First POST — creates session
-        resp1 = await client.post(
-            "/echo/mcp",
-            json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
-        )
-        assert resp1.status_code == 200
-        session_id = resp1.headers["mcp-session-id"]
-
-        # Second POST — uses session
-        resp2 = await client.post(
-            "/echo/mcp",
-            headers={"mcp-session-id": session_id},
-            json={"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}},
-        )
+    # First POST — creates session
+    resp1 = await client.post(
+        "/echo/mcp",
+        json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    )
+    assert resp1.status_code == 200
+    session_id = resp1.headers["mcp-session-id"]
+
+    # Second POST — uses session
+    resp2 = await client.post(
+        "/echo/mcp",
+        headers={"mcp-session-id": session_id},
+        json={"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}},
+    )
     assert resp2.status_code == 200
     # No new session header on subsequent requests
     assert "mcp-session-id" not in resp2.headers
@@ -283,15 +458,11 @@ async def test_second_post_routes_to_same_subprocess(app_with_echo_stdio, setup_
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_post_unknown_session_returns_404(app_with_echo_stdio, setup_logger):
+async def test_post_unknown_session_returns_404(setup_logger, no_spawn):
     """POST /mcp with unknown Mcp-Session-Id returns 404."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        resp = await client.post(
-            "/echo/mcp",
-            headers={"mcp-session-id": _UUID_A},
-            json={"jsonrpc": "2.0", "id": 1, "method": "ping"},
-        )
+    resp = await _post_echo_direct(
+        b'{"jsonrpc": "2.0", "id": 1, "method": "ping"}', session_id=_UUID_A
+    )
     assert resp.status_code == 404
 
 
@@ -300,15 +471,11 @@ async def test_post_unknown_session_returns_404(app_with_echo_stdio, setup_logge
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_post_invalid_session_id_format_returns_400(app_with_echo_stdio, setup_logger):
+async def test_post_invalid_session_id_format_returns_400(setup_logger, no_spawn):
     """POST /mcp with invalid Mcp-Session-Id format returns 400."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        resp = await client.post(
-            "/echo/mcp",
-            headers={"mcp-session-id": "not-a-uuid"},
-            json={"jsonrpc": "2.0", "id": 1, "method": "ping"},
-        )
+    resp = await _post_echo_direct(
+        b'{"jsonrpc": "2.0", "id": 1, "method": "ping"}', session_id="not-a-uuid"
+    )
     assert resp.status_code == 400
 
 
@@ -317,23 +484,21 @@ async def test_post_invalid_session_id_format_returns_400(app_with_echo_stdio, s
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_post_client_notification_returns_202(app_with_echo_stdio, setup_logger):
+async def test_post_client_notification_returns_202(client, setup_logger):
     """POST /mcp with no 'id' in body (client notification) returns 202 without waiting."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        # Create session first
-        resp1 = await client.post(
-            "/echo/mcp",
-            json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
-        )
-        session_id = resp1.headers["mcp-session-id"]
-
-        # Client notification (no id field)
-        resp2 = await client.post(
-            "/echo/mcp",
-            headers={"mcp-session-id": session_id},
-            json={"jsonrpc": "2.0", "method": "notifications/initialized"},
-        )
+    # Create session first
+    resp1 = await client.post(
+        "/echo/mcp",
+        json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    )
+    session_id = resp1.headers["mcp-session-id"]
+
+    # Client notification (no id field)
+    resp2 = await client.post(
+        "/echo/mcp",
+        headers={"mcp-session-id": session_id},
+        json={"jsonrpc": "2.0", "method": "notifications/initialized"},
+    )
     assert resp2.status_code == 202
 
 
@@ -342,19 +507,25 @@ async def test_post_client_notification_returns_202(app_with_echo_stdio, setup_l
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_post_batch_returns_400(app_with_echo_stdio, setup_logger):
+async def test_post_batch_returns_400(setup_logger, no_spawn):
     """POST /mcp with JSON array body (batch) returns 400."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        resp = await client.post(
-            "/echo/mcp",
-            content=json.dumps([
-                {"jsonrpc": "2.0", "id": 1, "method": "ping"},
-                {"jsonrpc": "2.0", "id": 2, "method": "pong"},
-            ]),
-            headers={"Content-Type": "application/json"},
-        )
+    resp = await _post_echo_direct(json.dumps([
+        {"jsonrpc": "2.0", "id": 1, "method": "ping"},
+        {"jsonrpc": "2.0", "id": 2, "method": "pong"},
+    ]).encode())
+    assert resp.status_code == 400
+
+    # Rejected before the subprocess is spawned
+    import mithril_proxy.bridge as bridge_mod
+    assert bridge_mod._stdio_bridges["echo"].process is None
+
+
+@pytest.mark.asyncio
+async def test_post_non_object_body_returns_400(setup_logger, no_spawn):
+    """POST /mcp with a body that is not a JSON object or array returns 400."""
+    resp = await _post_echo_direct(b"42")
     assert resp.status_code == 400
+    assert json.loads(resp.body)["error"] == "Invalid JSON body"
 
 
 # --------------------------------------------------------------------------- #
@@ -362,7 +533,7 @@ async def test_post_batch_returns_400(app_with_echo_stdio, setup_logger):
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_get_receives_subprocess_notification(app_with_notif_stdio, setup_logger):
+async def test_get_receives_subprocess_notification(notif_client, setup_logger):
     """Subprocess notifications are dispatched to registered notification queues.
 
     httpx.ASGITransport buffers the full response before returning, so it cannot
@@ -372,50 +543,61 @@ async def test_get_receives_subprocess_notification(app_with_notif_stdio, setup_
     """
     import mithril_proxy.bridge as bridge_mod
 
-    transport = httpx.ASGITransport(app=app_with_notif_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        # First POST — creates session (count=1 in subprocess, no notification)
-        resp1 = await client.post(
-            "/notif/mcp",
-            json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
-        )
-        assert resp1.status_code == 200
-        session_id = resp1.headers["mcp-session-id"]
-
-        # Manually register a notification queue (what GET handler does internally)
-        bridge = bridge_mod._stdio_bridges.get("notif")
-        assert bridge is not None
-        stream_uuid = str(uuid.uuid4())
-        q: asyncio.Queue = asyncio.Queue(maxsize=256)
-        bridge.notification_queues[stream_uuid] = q
-
-        # Second POST — subprocess sends notification (count=2) then responds
-        resp2 = await client.post(
-            "/notif/mcp",
-            headers={"mcp-session-id": session_id},
-            json={"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}},
-        )
-        assert resp2.status_code == 200
-        # Notification arrives before the response (stdout_reader is sequential),
-        # so by the time POST returns the queue already has the notification.
-
-    assert not q.empty(), "Notification queue should have received the subprocess notification"
-    notification_str = q.get_nowait()
-    notification = json.loads(notification_str)
-    assert notification.get("method") == "notifications/test"
+    # First POST — creates session (count=1 in subprocess, no notification)
+    resp1 = await notif_client.post(
+        "/notif/mcp",
+        json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    )
+    assert resp1.status_code == 200
+    session_id = resp1.headers["mcp-session-id"]
+
+    # Manually register a notification queue (what GET handler does internally)
+    bridge = bridge_mod._stdio_bridges.get("notif")
+    assert bridge is not None
+    stream_uuid = str(uuid.uuid4())
+    q: asyncio.Queue = asyncio.Queue(maxsize=256)
+    bridge.notification_queues[stream_uuid] = q
+
+    # Second POST — subprocess sends notification (count=2) then responds
+    resp2 = await notif_client.post(
+        "/notif/mcp",
+        headers={"mcp-session-id": session_id},
+        json={"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}},
+    )
+    assert resp2.status_code == 200
+    # Notification arrives before the response (stdout_reader is sequential),
+    # so by the time POST returns the queue already has the notification.
+
+    notifications = [json.loads(n) for n in _drain(q)]
+    assert [n.get("method") for n in notifications] == ["notifications/test"]
 
 
 # --------------------------------------------------------------------------- #
-# Test 8: GET /mcp without session ID → 400
+# Test 8: requests rejected on headers or route alone
 # --------------------------------------------------------------------------- #
 
-@pytest.mark.asyncio
-async def test_get_without_session_id_returns_400(app_with_echo_stdio, setup_logger):
-    """GET /mcp without Mcp-Session-Id header returns 400."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        resp = await client.get("/echo/mcp")
-    assert resp.status_code == 400
+_PING = {"jsonrpc": "2.0", "id": 1, "method": "ping"}
+
+
+@pytest.mark.parametrize("method, path, session_id, expected", [
+    ("GET", "/echo/mcp", None, 400),
+    ("GET", "/echo/mcp", "not-a-uuid", 400),
+    ("GET", "/echo/mcp", _UUID_A, 404),
+    ("DELETE", "/echo/mcp", None, 400),
+    ("DELETE", "/echo/mcp", _UUID_A, 404),
+    ("GET", "/echo/sse", None, 410),
+    ("POST", f"/echo/message?session_id={_UUID_A}", None, 410),
+])
+def test_rejected_request_status(
+    app_with_echo_stdio, sync_client, setup_logger, no_spawn,
+    method, path, session_id, expected,
+):
+    """Missing/unknown sessions and legacy SSE routes fail without a subprocess."""
+    headers = {} if session_id is None else {"mcp-session-id": session_id}
+    resp = sync_client.request(
+        method, path, headers=headers, json=_PING if method == "POST" else None
+    )
+    assert resp.status_code == expected
 
 
 # --------------------------------------------------------------------------- #
@@ -423,93 +605,60 @@ async def test_get_without_session_id_returns_400(app_with_echo_stdio, setup_log
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_delete_valid_session_returns_204(app_with_echo_stdio, setup_logger):
+async def test_delete_valid_session_returns_204(client, setup_logger):
     """DELETE /mcp with valid Mcp-Session-Id returns 204 and removes session."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        # Create session
-        resp1 = await client.post(
-            "/echo/mcp",
-            json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
-        )
-        session_id = resp1.headers["mcp-session-id"]
-
-        # Delete session
-        resp2 = await client.delete(
-            "/echo/mcp",
-            headers={"mcp-session-id": session_id},
-        )
-        assert resp2.status_code == 204
-
-        # Subsequent POST with same session ID should return 404
-        resp3 = await client.post(
-            "/echo/mcp",
-            headers={"mcp-session-id": session_id},
-            json={"jsonrpc": "2.0", "id": 2, "method": "ping"},
-        )
-    assert resp3.status_code == 404
-
-
-# --------------------------------------------------------------------------- #
-# Test 10: GET /sse for a stdio destination → 410
-# --------------------------------------------------------------------------- #
-
-@pytest.mark.asyncio
-async def test_get_sse_for_stdio_returns_410(app_with_echo_stdio, setup_logger):
-    """GET /{stdio_dest}/sse returns 410 Gone."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        resp = await client.get("/echo/sse")
-    assert resp.status_code == 410
-    assert "mcp" in resp.json()["error"].lower()
-
+    # Create session
+    resp1 = await client.post(
+        "/echo/mcp",
+        json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    )
+    session_id = resp1.headers["mcp-session-id"]
 
-# --------------------------------------------------------------------------- #
-# Test 11: POST /message for a stdio destination → 410
-# --------------------------------------------------------------------------- #
+    # Delete session
+    resp2 = await client.delete(
+        "/echo/mcp",
+        headers={"mcp-session-id": session_id},
+    )
+    assert resp2.status_code == 204
 
-@pytest.mark.asyncio
-async def test_post_message_for_stdio_returns_410(app_with_echo_stdio, setup_logger):
-    """POST /{stdio_dest}/message returns 410 Gone."""
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        resp = await client.post(
-            f"/echo/message?session_id={_UUID_A}",
-            json={"jsonrpc": "2.0", "id": 1, "method": "ping"},
-        )
-    assert resp.status_code == 410
-    assert "mcp" in resp.json()["error"].lower()
+    # Subsequent POST with same session ID should return 404
+    resp3 = await client.post(
+        "/echo/mcp",
+        headers={"mcp-session-id": session_id},
+        json={"jsonrpc": "2.0", "id": 2, "method": "ping"},
+    )
+    assert resp3.status_code == 404
 
 
 # --------------------------------------------------------------------------- #
-# Test 12: Connection cap — 11th session returns 503
+# Test 10: Connection cap — 11th session returns 503
 # --------------------------------------------------------------------------- #
 
 @pytest.mark.asyncio
-async def test_connection_cap_returns_503(app_with_echo_stdio, setup_logger):
+async def test_connection_cap_returns_503(client, setup_logger):
     """After MAX_STDIO_CONNECTIONS sessions, next POST without session ID returns 503."""
     import mithril_proxy.bridge as bridge_mod
 
-    transport = httpx.ASGITransport(app=app_with_echo_stdio)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        # Create the first real session to ensure the bridge exists
-        resp = await client.post(
-            "/echo/mcp",
-            json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
-        )
-        assert resp.status_code == 200
-
-        # Pre-fill bridge.sessions with fake UUIDs to hit the cap
-        bridge = bridge_mod._stdio_bridges.get("echo")
-        assert bridge is not None
-        cap = bridge_mod._MAX_CONNECTIONS_PER_DEST
-        while len(bridge.sessions) < cap:
-            bridge.sessions.add(str(uuid.uuid4()))
-
-        # Next new-session request must be rejected
-        resp_cap = await client.post(
-            "/echo/mcp",
-            json={"jsonrpc": "2.0", "id": 99, "method": "initialize", "params": {}},
-        )
+    # Create the first real session to ensure the bridge exists
+    resp = await client.post(
+        "/echo/mcp",
+        json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    )
+    assert resp.status_code == 200
+
+    # Pre-fill bridge.sessions with fake UUIDs to hit the cap
+    bridge = bridge_mod._stdio_bridges.get("echo")
+    assert bridge is not None
+    cap = bridge_mod._MAX_CONNECTIONS_PER_DEST
+    bridge.sessions.update(
+        f"00000000-0000-4000-8000-{i:012x}" for i in range(cap - len(bridge.sessions))
+    )
+    assert len(bridge.sessions) == cap
+
+    # Next new-session request must be rejected
+    resp_cap = await client.post(
+        "/echo/mcp",
+        json={"jsonrpc": "2.0", "id": 99, "method": "initialize", "params": {}},
+    )
     assert resp_cap.status_code == 503
     assert "Too many active sessions" in resp_cap.json()["error"]